@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+#   This file is part of nexdatas - Tango Server for NeXus data writer
+#
+#    Copyright (C) 2026 DESY, Jan Kotanski <jkotan@mail.desy.de>
+#
+#    nexdatas is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    nexdatas is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with nexdatas.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+""" handlers of stream data referenced in detector files """
+
+import os
+import numpy as np
+from pninexus import h5cpp
+
+
+def frame_layout(length, frame_per_acquisition, frame_per_file):
+    """ numbers of frames in subsequent detector files
+
+    :param length: number of frames
+    :type length: :obj:`int`
+    :param frame_per_acquisition: frame per acquisition
+    :type frame_per_acquisition: :obj:`int`
+    :param frame_per_file: frame per file
+    :type frame_per_file: :obj:`int`
+    :returns: numbers of frames in files
+    :rtype: :class:`numpy.ndarray`
+    """
+    acq_nb, remaining_scan_frame_nb = divmod(length, frame_per_acquisition)
+    acq_files_nb, last_file_scan_frame_nb = divmod(
+        frame_per_acquisition, frame_per_file)
+    remaining_acq_files_nb, remaining_last_file_scan_frame_nb = divmod(
+        remaining_scan_frame_nb, frame_per_file)
+    acq_frames = [frame_per_file] * acq_files_nb
+    if last_file_scan_frame_nb:
+        acq_frames += [last_file_scan_frame_nb]
+    remaining_frames = [frame_per_file] * remaining_acq_files_nb
+    if remaining_last_file_scan_frame_nb:
+        remaining_frames += [remaining_last_file_scan_frame_nb]
+    return np.concatenate([
+        np.tile(np.array(acq_frames, dtype=np.int64), acq_nb),
+        np.array(remaining_frames, dtype=np.int64)])
+
+
+def file_pattern(fpath, key, file_path):
+    """ detector file pattern with respect to the nexus file
+
+    :param fpath: nexus file path
+    :type fpath: :obj:`pathlib.Path`
+    :param key: channel label
+    :type key: :obj:`str`
+    :param file_path: detector file path
+    :type file_path: :obj:`str`
+    :returns: detector file pattern
+    :rtype: :obj:`str`
+    """
+    common_prefix = os.path.commonprefix(
+        [os.path.split(fpath)[0], file_path])
+    if common_prefix in ["/", "", os.sep]:
+        tfn = os.path.splitext(fpath)
+        ofp = file_path.split(os.sep)
+        return os.sep.join([tfn[0], key, ofp[-1]])
+    return os.path.relpath(file_path, common_prefix)
+
+
+def file_vmaps(shape, frame_per_acquisition,
+               file_offset, file_format, file_pattern,
+               data_path, frame_per_file, check=None, live=False):
+    """ generate virtual map list of detector files
+
+    :param shape: shape
+    :type shape: :obj:`list` < :obj:`int` >
+    :param frame_per_acquisition: frame per acquisition
+    :type frame_per_acquisition: :obj:`int`
+    :param file_offset: file offset
+    :type file_offset: :obj:`int`
+    :param file_format: file format
+    :type file_format: :obj:`str`
+    :param file_pattern: file pattern
+    :type file_pattern: :obj:`str`
+    :param data_path: nexus data path
+    :type data_path: :obj:`str`
+    :param frame_per_file: frame per file
+    :type frame_per_file: :obj:`int`
+    :param check: function correcting numbers of frames in files
+                  by existing source files
+    :type check: :obj:`callable`
+    :param live: unlimited mapping of a vds growing with detector files,
+                 otherwise mapping bounded by the shape
+    :type live: :obj:`bool`
+    :returns: virtual map list
+    :rtype: :obj:`list` <:obj:`dict`>
+    """
+    vmaps = []
+    if file_format not in ["hdf5"] or not frame_per_acquisition \
+       or not data_path or not frame_per_file:
+        return vmaps
+    frame_nb = frame_layout(
+        shape[0], frame_per_acquisition, frame_per_file)
+    if not len(frame_nb):
+        return vmaps
+    file_ids = np.arange(len(frame_nb)) + file_offset
+    offsets = np.zeros(len(frame_nb), dtype=np.int64)
+    np.cumsum(frame_nb[:-1], out=offsets[1:])
+    if check is not None:
+        frame_nb = check(frame_nb, file_ids, file_pattern, data_path)
+    vshape = list(shape)
+    if live:
+        if file_offset or file_pattern.count("%") != 1 \
+           or "%d" not in file_pattern \
+           or not np.all(frame_nb == frame_per_file):
+            return vmaps
+        # one unlimited mapping over all files with the block number
+        vshape[0] = frame_per_file
+        unlimited = [h5cpp.dataspace.UNLIMITED] + vshape[1:]
+        vmaps.append({
+            "class": "VirtualDataMap",
+            "filename": file_pattern.replace("%d", "%b"),
+            "path": data_path,
+            "view": {"class": "View",
+                     "dataspace": {"class": "Simple",
+                                   "shape": vshape,
+                                   "maxshape": unlimited},
+                     "selection": {"block": vshape,
+                                   "offset": [0] * len(vshape),
+                                   "stride": vshape,
+                                   "count": [h5cpp.dataspace.UNLIMITED]
+                                   + [1] * (len(vshape) - 1)
+                                   }
+                     },
+            "sourceview": {"class": "View",
+                           "dataspace": {"class": "Simple",
+                                         "shape": vshape}}
+        })
+    else:
+        # missing files are not mapped
+        mapped = frame_nb > 0
+        vmaps.append({
+            "class": "VirtualDataBlocks",
+            "filename": file_pattern,
+            "path": data_path,
+            "shape": vshape,
+            "frames": frame_nb[mapped],
+            "offsets": offsets[mapped],
+            "file_ids": file_ids[mapped]
+        })
+    return vmaps
+
+
+class DataHandler:
+
+    """ referenced data handler of a stream plugin and format
+    """
+
+    def vmaps(self, key, info, shape, fpath, check=None):
+        """ generate virtual map list at the end of the scan
+
+        :param key: channel label
+        :type key: :obj:`str`
+        :param info: stream info
+        :type info: :obj:`dict` <:obj:`str`, `any`>
+        :param shape: vds shape
+        :type shape: :obj:`list` < :obj:`int` >
+        :param fpath: nexus file path
+        :type fpath: :obj:`pathlib.Path`
+        :param check: function correcting numbers of frames in files
+                      by existing source files
+        :type check: :obj:`callable`
+        :returns: virtual map list
+        :rtype: :obj:`list` <:obj:`dict`>
+        """
+        return []
+
+    def live_vmaps(self, key, info, frame_shape, fpath):
+        """ generate virtual map list of a vds growing during the scan
+
+        :param key: channel label
+        :type key: :obj:`str`
+        :param info: stream info
+        :type info: :obj:`dict` <:obj:`str`, `any`>
+        :param frame_shape: frame shape
+        :type frame_shape: :obj:`list` < :obj:`int` >
+        :param fpath: nexus file path
+        :type fpath: :obj:`pathlib.Path`
+        :returns: virtual map list, empty if not supported
+        :rtype: :obj:`list` <:obj:`dict`>
+        """
+        return []
+
+
+class LimaHandler(DataHandler):
+
+    """ lima_v1 streams with frames in a series of hdf5 files
+    """
+
+    def vmaps(self, key, info, shape, fpath, check=None):
+        """ generate virtual map list at the end of the scan
+
+        :param key: channel label
+        :type key: :obj:`str`
+        :param info: stream info
+        :type info: :obj:`dict` <:obj:`str`, `any`>
+        :param shape: vds shape
+        :type shape: :obj:`list` < :obj:`int` >
+        :param fpath: nexus file path
+        :type fpath: :obj:`pathlib.Path`
+        :param check: function correcting numbers of frames in files
+                      by existing source files
+        :type check: :obj:`callable`
+        :returns: virtual map list
+        :rtype: :obj:`list` <:obj:`dict`>
+        """
+        linfo = info["lima_info"]
+        # acquisition_offset = linfo["acquisition_offset"]
+        return file_vmaps(
+            shape,
+            linfo["frame_per_acquisition"],
+            linfo["file_offset"],
+            linfo["file_format"],
+            file_pattern(fpath, key, linfo["file_path"]),
+            linfo["data_path"],
+            linfo["frame_per_file"],
+            check)
+
+    def live_vmaps(self, key, info, frame_shape, fpath):
+        """ generate virtual map list of a vds growing during the scan
+
+        :param key: channel label
+        :type key: :obj:`str`
+        :param info: stream info
+        :type info: :obj:`dict` <:obj:`str`, `any`>
+        :param frame_shape: frame shape
+        :type frame_shape: :obj:`list` < :obj:`int` >
+        :param fpath: nexus file path
+        :type fpath: :obj:`pathlib.Path`
+        :returns: virtual map list, empty if not supported
+        :rtype: :obj:`list` <:obj:`dict`>
+        """
+        linfo = info["lima_info"]
+        # all acquisitions are checked for partial files
+        return file_vmaps(
+            [linfo["frame_per_acquisition"]] + list(frame_shape),
+            linfo["frame_per_acquisition"],
+            linfo["file_offset"],
+            linfo["file_format"],
+            file_pattern(fpath, key, linfo["file_path"]),
+            linfo["data_path"],
+            linfo["frame_per_file"],
+            live=True)
+
+
+class SingleFileHandler(DataHandler):
+
+    """ streams with all frames in one hdf5 file described
+        by 'file_path' and 'data_path' of the stream info
+    """
+
+    def vmaps(self, key, info, shape, fpath, check=None):
+        """ generate virtual map list at the end of the scan
+
+        :param key: channel label
+        :type key: :obj:`str`
+        :param info: stream info
+        :type info: :obj:`dict` <:obj:`str`, `any`>
+        :param shape: vds shape
+        :type shape: :obj:`list` < :obj:`int` >
+        :param fpath: nexus file path
+        :type fpath: :obj:`pathlib.Path`
+        :param check: function correcting numbers of frames in files
+                      by existing source files
+        :type check: :obj:`callable`
+        :returns: virtual map list
+        :rtype: :obj:`list` <:obj:`dict`>
+        """
+        if not info.get("file_path") or not info.get("data_path") \
+           or not shape or not shape[0]:
+            return []
+        fpattern = file_pattern(fpath, key, info["file_path"])
+        frame_nb = np.array([shape[0]], dtype=np.int64)
+        file_ids = np.zeros(1, dtype=np.int64)
+        if check is not None:
+            frame_nb = check(
+                frame_nb, file_ids, fpattern, info["data_path"])
+        mapped = frame_nb > 0
+        # one block of the whole file
+        return [{
+            "class": "VirtualDataBlocks",
+            "filename": fpattern,
+            "path": info["data_path"],
+            "shape": list(shape),
+            "frames": frame_nb[mapped],
+            "offsets": np.zeros(1, dtype=np.int64)[mapped],
+            "file_ids": file_ids[mapped]
+        }]
+
+
+#: (:obj:`dict` <:obj:`tuple`, :class:`DataHandler`>)
+#:    referenced data handlers with their stream plugins and formats
+HANDLERS = {
+    ("lima", "lima_v1"): LimaHandler(),
+}
+
+
+def register_handler(plugin, format, handler):
+    """ register referenced data handler
+
+    :param plugin: stream plugin
+    :type plugin: :obj:`str`
+    :param format: stream format
+    :type format: :obj:`str`
+    :param handler: referenced data handler
+    :type handler: :class:`DataHandler`
+    """
+    HANDLERS[(plugin, format)] = handler
+
+
+def register_single_file_formats(formats):
+    """ register handlers of stream plugins and formats
+        with all frames in one hdf5 file
+
+    :param formats: comma separated 'plugin:format' pairs
+    :type formats: :obj:`str`
+    """
+    for pf in (formats or "").split(","):
+        if ":" in pf:
+            plugin, format = [it.strip() for it in pf.split(":", 1)]
+            if plugin and format and (plugin, format) not in HANDLERS:
+                register_handler(plugin, format, SingleFileHandler())
+
+
+def data_handler(plugin, format):
+    """ find referenced data handler
+
+    :param plugin: stream plugin
+    :type plugin: :obj:`str`
+    :param format: stream format
+    :type format: :obj:`str`
+    :returns: referenced data handler or None
+    :rtype: :class:`DataHandler`
+    """
+    return HANDLERS.get((plugin, format))
+
+
+def has_plugin(plugin):
+    """ if data of the stream plugin are referenced in detector files
+
+    :param plugin: stream plugin
+    :type plugin: :obj:`str`
+    :returns: True if any handler of the plugin is registered
+    :rtype: :obj:`bool`
+    """
+    return any(pl == plugin for pl, _ in HANDLERS)
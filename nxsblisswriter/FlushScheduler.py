@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+#   This file is part of nexdatas - Tango Server for NeXus data writer
+#
+#    Copyright (C) 2026 DESY, Jan Kotanski <jkotan@mail.desy.de>
+#
+#    nexdatas is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    nexdatas is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with nexdatas.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+""" adaptive scheduler of scan point writes """
+
+import time
+
+
+class FlushScheduler:
+
+    def __init__(self, min_latency=0.1, max_latency=1,
+                 block_points=1024, duty=0.2, smoothing=0.3):
+        """ constructor
+
+        :param min_latency: minimal time between writes in seconds
+        :type min_latency: :obj:`float`
+        :param max_latency: maximal time between writes in seconds
+        :type max_latency: :obj:`float`
+        :param block_points: number of points in a write block
+                             collected for fast scans
+        :type block_points: :obj:`int`
+        :param duty: maximal fraction of time spent on writing
+        :type duty: :obj:`float`
+        :param smoothing: weight of the last measurement in averages
+        :type smoothing: :obj:`float`
+        """
+        #: (:obj:`float`) minimal time between writes
+        self.min_latency = max(0, min_latency)
+        #: (:obj:`float`) maximal time between writes
+        self.max_latency = max(self.min_latency, max_latency)
+        #: (:obj:`int`) number of points in a write block
+        self.block_points = max(1, block_points)
+        #: (:obj:`float`) maximal fraction of time spent on writing
+        self.duty = duty
+        #: (:obj:`float`) weight of the last measurement in averages
+        self.smoothing = smoothing
+        #: (:obj:`float`) current write interval in seconds
+        self.interval = self.min_latency
+        #: (:obj:`float`) average point rate in points per second
+        self.rate = 0.0
+        #: (:obj:`float`) average write time in seconds
+        self.write_time = 0.0
+        #: (:obj:`float`) last write time
+        self.__last_time = None
+
+    def __average(self, average, value):
+        """ exponential moving average
+
+        :param average: previous average
+        :type average: :obj:`float`
+        :param value: new measurement
+        :type value: :obj:`float`
+        :returns: new average
+        :rtype: :obj:`float`
+        """
+        return self.smoothing * value + (1 - self.smoothing) * average
+
+    def delay(self, now=None):
+        """ time to the next write
+
+        :param now: current monotonic time
+        :type now: :obj:`float`
+        :returns: time to the next write in seconds
+        :rtype: :obj:`float`
+        """
+        if self.__last_time is None:
+            return 0
+        if now is None:
+            now = time.monotonic()
+        return max(0, self.__last_time + self.interval - now)
+
+    def due(self, now=None):
+        """ if the next write is due
+
+        :param now: current monotonic time
+        :type now: :obj:`float`
+        :returns: True if data should be written
+        :rtype: :obj:`bool`
+        """
+        return self.delay(now) <= 0
+
+    def update(self, npoints, write_time, now=None):
+        """ update the write interval after a write
+
+        :param npoints: number of points read from the stream backlog
+        :type npoints: :obj:`int`
+        :param write_time: time spent on writing in seconds
+        :type write_time: :obj:`float`
+        :param now: current monotonic time
+        :type now: :obj:`float`
+        """
+        if now is None:
+            now = time.monotonic()
+        if self.__last_time is not None:
+            elapsed = now - self.__last_time
+            if elapsed > 0:
+                self.rate = self.__average(self.rate, npoints / elapsed)
+        self.write_time = self.__average(self.write_time, write_time)
+        self.__last_time = now
+
+        if npoints >= 2 * self.block_points:
+            # backlog is growing: drain it as soon as possible
+            interval = self.min_latency
+        else:
+            if self.rate * self.max_latency >= self.block_points:
+                # fast scan: collect bigger blocks
+                interval = self.block_points / self.rate
+            else:
+                # slow scan: show data as soon as possible
+                interval = self.min_latency
+            if self.duty > 0:
+                interval = max(interval, self.write_time / self.duty)
+        self.interval = min(max(interval, self.min_latency), self.max_latency)
@@ -50,6 +50,66 @@ class NXSBlissWriter(Device):
         PointSleepTime
             - sleep time between write_point command calls
             - Type:'float'
+        BatchedRead
+            - read all channel streams in one redis call
+            - Type:'bool'
+        EventWaitTime
+            - maximal wait time for scan events, polling if 0
+            - Type:'float'
+        MinWriteLatency
+            - minimal time between scan point writes
+            - Type:'float'
+        MaxWriteLatency
+            - maximal time between scan point writes
+            - Type:'float'
+        WriteBlockPoints
+            - number of scan points in a write block of fast scans,
+              from the chunk size if 0
+            - Type:'int'
+        PreallocateFields
+            - grow streamed fields in large steps with fill values
+              past the written rows until the scan ends
+            - Type:'bool'
+        ChunkByteSize
+            - chunk size of streamed fields in bytes, one frame if 0
+            - Type:'int'
+        Compression
+            - default compression filters, e.g. 'shuffle,deflate:4'
+            - Type:'str'
+        DirectChunkWrite
+            - write whole chunks of streamed frames directly
+            - Type:'bool'
+        PipelineQueueDepth
+            - read blocks queued for writing, one thread if 0
+            - Type:'int'
+        SkeletonCacheDir
+            - cache directory of skeleton nexus files, disabled if empty
+            - Type:'str'
+        PrefetchScan
+            - build file structures of new scans before they are prepared
+            - Type:'bool'
+        LibVersion
+            - hdf5 library version bounds, e.g. 'latest', defaults if empty
+            - Type:'str'
+        SWMRMode
+            - write streamed fields in the SWMR mode for live readers
+            - Type:'bool'
+        SWMRFlushTime
+            - minimal time between file flushes in the SWMR mode
+            - Type:'float'
+        VDSSourceCheck
+            - check of lima files mapped by VDS: 'stat', 'open' or none
+            - Type:'str'
+        MaxScanWriters
+            - maximal number of concurrent scan writers, unlimited if 0
+            - Type:'int'
+        ProcessWriters
+            - write scans in a pool of worker processes
+            - Type:'bool'
+        SingleFileFormats
+            - comma separated plugin:format pairs of streams
+              with all frames in one hdf5 file
+            - Type:'str'
     """
 
     # -----------------
@@ -86,6 +146,123 @@ class NXSBlissWriter(Device):
         doc="sleep time between write_point command calls"
     )
 
+    BatchedRead = device_property(
+        dtype='bool',
+        default_value=False,
+        doc="read all channel streams in one redis call"
+    )
+
+    EventWaitTime = device_property(
+        dtype='float',
+        default_value=0,
+        doc="maximal wait time for scan events, polling if 0"
+    )
+
+    MinWriteLatency = device_property(
+        dtype='float',
+        default_value=1,
+        doc="minimal time between scan point writes"
+    )
+
+    MaxWriteLatency = device_property(
+        dtype='float',
+        default_value=1,
+        doc="maximal time between scan point writes"
+    )
+
+    WriteBlockPoints = device_property(
+        dtype='int',
+        default_value=0,
+        doc="number of scan points in a write block of fast scans, "
+        "from the chunk size if 0"
+    )
+
+    PreallocateFields = device_property(
+        dtype='bool',
+        default_value=False,
+        doc="grow streamed fields in large steps with fill values "
+        "past the written rows until the scan ends"
+    )
+
+    ChunkByteSize = device_property(
+        dtype='int',
+        default_value=1048576,
+        doc="chunk size of streamed fields in bytes, one frame if 0"
+    )
+
+    Compression = device_property(
+        dtype='str',
+        default_value="",
+        doc="default compression filters, e.g. 'shuffle,deflate:4'"
+    )
+
+    DirectChunkWrite = device_property(
+        dtype='bool',
+        default_value=False,
+        doc="write whole chunks of streamed frames directly"
+    )
+
+    PipelineQueueDepth = device_property(
+        dtype='int',
+        default_value=0,
+        doc="read blocks queued for writing, one thread if 0"
+    )
+
+    SkeletonCacheDir = device_property(
+        dtype='str',
+        default_value="",
+        doc="cache directory of skeleton nexus files, disabled if empty"
+    )
+
+    PrefetchScan = device_property(
+        dtype='bool',
+        default_value=False,
+        doc="build file structures of new scans before they are prepared"
+    )
+
+    LibVersion = device_property(
+        dtype='str',
+        default_value="",
+        doc="hdf5 library version bounds, e.g. 'latest', defaults if empty"
+    )
+
+    SWMRMode = device_property(
+        dtype='bool',
+        default_value=False,
+        doc="write streamed fields in the SWMR mode for live readers"
+    )
+
+    SWMRFlushTime = device_property(
+        dtype='float',
+        default_value=1,
+        doc="minimal time between file flushes in the SWMR mode"
+    )
+
+    VDSSourceCheck = device_property(
+        dtype='str',
+        default_value="",
+        doc="check of lima files mapped by VDS: 'stat', 'open' or none"
+    )
+
+    MaxScanWriters = device_property(
+        dtype='int',
+        default_value=0,
+        doc="maximal number of concurrent scan writers, unlimited if 0"
+    )
+
+    ProcessWriters = device_property(
+        dtype='bool',
+        default_value=False,
+        doc="write scans in a pool of worker processes"
+    )
+
+    SingleFileFormats = device_property(
+        dtype='str',
+        default_value="",
+        doc="comma separated plugin:format pairs of streams "
+        "with all frames in one hdf5 file"
+    )
+
     # ----------
     # Attributes
     # ----------
@@ -109,10 +286,39 @@ class NXSBlissWriter(Device):
             self.RedisUrl, self.Session, self.NextScanTimeout,
             self.DefaultNeXusPath,
             self.PointSleepTime,
-            self
+            self,
+            self.file_options(),
+            self.EventWaitTime,
+            self.PipelineQueueDepth,
+            self.PrefetchScan,
+            self.MaxScanWriters,
+            self.ProcessWriters
         )
         self.Start()
 
+    def file_options(self):
+        """ NXSFile keyword options from device properties
+
+        :returns: NXSFile keyword options
+        :rtype: :obj:`dict` <:obj:`str`, `any`>
+        """
+        return {
+            "batch_read": self.BatchedRead,
+            "min_write_latency": self.MinWriteLatency,
+            "max_write_latency": self.MaxWriteLatency,
+            "write_block_points": self.WriteBlockPoints,
+            "preallocate": self.PreallocateFields,
+            "chunk_bytes": self.ChunkByteSize,
+            "compression": self.Compression,
+            "direct_chunk_write": self.DirectChunkWrite,
+            "skeleton_dir": self.SkeletonCacheDir,
+            "libver": self.LibVersion,
+            "swmr": self.SWMRMode,
+            "swmr_flush_time": self.SWMRFlushTime,
+            "vds_check": self.VDSSourceCheck,
+            "single_file_formats": self.SingleFileFormats,
+        }
+
     def dev_status(self):
         return self.nxs_writer_service.get_status()
 
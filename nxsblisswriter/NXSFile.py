@@ -29,12 +29,28 @@ from lxml import etree
 import numpy as np
 import json
 import os
+import shutil
+import datetime
+import zlib
+import hashlib
+import threading
+import collections
+import concurrent.futures
 
 # from blissdata.redis_engine.store import DataStore
 # from blissdata.redis_engine.scan import ScanState
 from blissdata.redis_engine.exceptions import EndOfStream
 # from blissdata.redis_engine.exceptions import NoScanAvailable
 
+try:
+    from blissdata.streams import CursorGroup
+except Exception:
+    CursorGroup = None
+
+from .FlushScheduler import FlushScheduler
+from .DataHandlers import (
+    file_vmaps, data_handler, has_plugin, register_single_file_formats)
+
 
 ALLOWED_NXS_SURFIXES = {".nxs", ".h5", ".hdf5", ".nx"}
 
@@ -78,8 +94,81 @@ ATTRDESC = {
 }
 
 
+#: (:obj:`dict` <:obj:`str`, :obj:`int`>) registered HDF5 filter plugins
+FILTER_IDS = {
+    "lzf": 32000,
+    "blosc": 32001,
+    "lz4": 32004,
+    "bitshuffle": 32008,
+    "zstd": 32015,
+}
+
+#: (:obj:`dict` <:obj:`str`, :class:`pninexus.h5cpp.property.LibVersion`>)
+#:    hdf5 library version bounds
+LIBVERSIONS = {
+    "earliest": h5cpp.property.LibVersion.EARLIEST,
+    "latest": h5cpp.property.LibVersion.LATEST,
+}
+
+#: (:obj:`set` <:obj:`str`>) data types written by direct chunk writes
+DIRECT_DTYPES = {"int64", "int32", "int16", "int8",
+                 "uint64", "uint32", "uint16", "uint8",
+                 "float64", "float32"}
+
+#: (:obj:`int`) maximal number of cached xml templates
+XML_CACHE_SIZE = 16
+
+#: (:class:`collections.OrderedDict` <:obj:`str`, :obj:`str`>)
+#:    transformed xml templates with their xml hashes
+_xml_cache = collections.OrderedDict()
+
+#: (:class:`threading.Lock`) xml template cache lock
+_xml_cache_lock = threading.Lock()
+
+#: (:obj:`str`) name of an entry group in skeleton files
+SKELETON_ENTRY = "__nxsentry%s__"
+
+#: (:obj:`int`) maximal number of skeleton files in the cache directory
+SKELETON_CACHE_SIZE = 16
+
+#: (:class:`collections.OrderedDict` <:obj:`str`, :obj:`tuple`>)
+#:    skeleton hashes, templates and entry names with their xml hashes
+_skeleton_cache = collections.OrderedDict()
+
+#: (:obj:`dict` <:obj:`str`, :obj:`list`>)
+#:    soft links of skeleton files with their skeleton hashes
+_skeleton_links = {}
+
+#: (:class:`collections.OrderedDict` <:obj:`str`, :obj:`dict`>)
+#:    node path indexes of file structures with their xml hashes
+_nodes_cache = collections.OrderedDict()
+
+#: (:obj:`set` <:obj:`str`>) xml tags of created nodes
+NODE_TAGS = {"group", "field", "link", "vds"}
+
+#: (:obj:`int`) minimal number of rows added to a growing field
+MIN_EXTENT_STEP = 1024
+
+#: (:obj:`float`) maximal wait time of stream reads without a timeout
+READ_TIMEOUT = 1
+
+#: (:obj:`int`) maximal number of threads checking vds source files
+VDS_CHECK_WORKERS = 16
+
+#: (:obj:`int`) maximal number of cached vds source files
+VDS_SOURCE_CACHE_SIZE = 65536
+
+#: (:class:`collections.OrderedDict` <:obj:`tuple`, :obj:`tuple`>)
+#:    file stamps and frame numbers with vds source file and data paths
+_vds_source_cache = collections.OrderedDict()
+
+#: (:class:`threading.Lock`) vds source cache lock
+_vds_source_lock = threading.Lock()
+
+
 NOATTRS = {"name", "label", "dtype", "value", "nexus_path",
-           "shape", "stream", "__vmaps__", "__vmaps_shape__"}
+           "shape", "stream", "chunk", "compression",
+           "__vmaps__", "__vmaps_shape__"}
 
 
 def first(array):
@@ -105,10 +194,354 @@ def first(array):
     return array
 
 
+def transform_xml(xmlc):
+    """ transform nxsdatawriter xml settings to the file structure xml
+
+    :param xmlc: nxsdatawriter xml settings
+    :type xmlc: :obj:`str`
+    :returns: file structure xml
+    :rtype: :obj:`str`
+    """
+    xmlc1 = xmlc.replace('"NX_DATE_TIME"', '"NX_CHAR"')
+    xmlc2 = xmlc1.replace('index="1"', 'index="0"').replace(
+        'index="2"', 'index="1"').replace('index="3"', 'index="2"')
+    etroot = et.fromstring(
+        xmlc2, parser=XMLParser(collect_ids=False))
+    etdims = etroot.findall(".//dimensions")
+    for etdim in etdims:
+        dparent = etdim.getparent()
+        if dparent.tag in ["field", "vds"]:
+            ddparent = dparent.getparent()
+            ddparent.remove(dparent)
+    return etree.tostring(etroot, encoding='unicode',
+                          method='xml', pretty_print=True)
+
+
+def xml_template(xmlc):
+    """ get the file structure xml from the LRU cache
+
+    :param xmlc: nxsdatawriter xml settings
+    :type xmlc: :obj:`str`
+    :returns: xml hash and file structure xml
+    :rtype: (:obj:`str`, :obj:`str`)
+    """
+    key = hashlib.sha256(xmlc.encode()).hexdigest()
+    with _xml_cache_lock:
+        if key in _xml_cache:
+            _xml_cache.move_to_end(key)
+            return key, _xml_cache[key]
+    xmls = transform_xml(xmlc)
+    with _xml_cache_lock:
+        _xml_cache[key] = xmls
+        while len(_xml_cache) > XML_CACHE_SIZE:
+            _xml_cache.popitem(last=False)
+    return key, xmls
+
+
+def skeleton_template(key, xmls):
+    """ get the skeleton xml with generic entry names from the LRU cache
+
+    :param key: xml hash
+    :type key: :obj:`str`
+    :param xmls: file structure xml
+    :type xmls: :obj:`str`
+    :returns: skeleton hash, skeleton xml and entry names
+    :rtype: (:obj:`str`, :obj:`str`, :obj:`list` < :obj:`str` >)
+    """
+    with _xml_cache_lock:
+        if key in _skeleton_cache:
+            _skeleton_cache.move_to_end(key)
+            return _skeleton_cache[key]
+    etroot = et.fromstring(
+        xmls, parser=XMLParser(collect_ids=False))
+    entries = []
+    for etgrp in etroot.findall("group"):
+        if etgrp.get("type") == "NXentry":
+            name = etgrp.get("name")
+            if name in entries:
+                continue
+            etgrp.set("name", SKELETON_ENTRY % len(entries))
+            entries.append(name)
+    for etlink in etroot.iter("link"):
+        target = etlink.get("target") or ""
+        if not target.startswith("/"):
+            continue
+        name = target[1:].split("/")[0].split(":")[0]
+        if name in entries:
+            etlink.set(
+                "target", "/%s%s" % (
+                    SKELETON_ENTRY % entries.index(name),
+                    target[1 + len(name):]))
+    template = etree.tostring(etroot, encoding='unicode',
+                              method='xml', pretty_print=True)
+    skey = hashlib.sha256(template.encode()).hexdigest()
+    with _xml_cache_lock:
+        _skeleton_cache[key] = (skey, template, entries)
+        while len(_skeleton_cache) > XML_CACHE_SIZE:
+            _skeleton_cache.popitem(last=False)
+    return skey, template, entries
+
+
+def soft_links(group):
+    """ soft links in the group tree without resolving them,
+        i.e. without hdf5 errors of dangling links
+
+    :param group: h5cpp group
+    :type group: :class:`pninexus.h5cpp.node.Group`
+    :returns: parent paths, names and targets of soft links
+    :rtype: :obj:`list` <(:obj:`str`, :obj:`str`, :obj:`str`)>
+    """
+    links = []
+    for lk in group.links:
+        ltype = lk.type()
+        if ltype == h5cpp.node.LinkType.SOFT:
+            links.append((str(lk.parent.link.path), lk.path.name,
+                          str(lk.target().object_path)))
+        elif ltype == h5cpp.node.LinkType.HARD and \
+                lk.node.type == h5cpp.node.Type.GROUP:
+            links.extend(soft_links(group.get_group(lk.path.name)))
+    return links
+
+
+def node_path(lnxpath):
+    """ hdf5 path of the nexus path
+
+    :param lnxpath: nexus path list
+    :type lnxpath: :obj:`list` <:obj:`str`>
+    :returns: hdf5 path
+    :rtype: :obj:`str`
+    """
+    return "".join("/%s" % nd.split(":")[0] for nd in lnxpath if nd)
+
+
+def xml_nodes(key, xmls):
+    """ get the node path index of the file structure from the LRU cache
+
+    :param key: xml hash
+    :type key: :obj:`str`
+    :param xmls: file structure xml
+    :type xmls: :obj:`str`
+    :returns: node kinds, i.e. group, field or None if unknown,
+              with their hdf5 paths or None if the index is not complete
+    :rtype: :obj:`dict` <:obj:`str`, :obj:`str`>
+    """
+    with _xml_cache_lock:
+        if key in _nodes_cache:
+            _nodes_cache.move_to_end(key)
+            return _nodes_cache[key]
+    etroot = et.fromstring(
+        xmls, parser=XMLParser(collect_ids=False))
+    nodes = {}
+    etnodes = [(etroot, "")]
+    while etnodes and nodes is not None:
+        etparent, ppath = etnodes.pop()
+        for etnode in etparent:
+            if etnode.tag not in NODE_TAGS:
+                continue
+            name = etnode.get("name")
+            if not name:
+                nodes = None
+                break
+            path = "%s/%s" % (ppath, name)
+            if etnode.tag == "group":
+                nodes[path] = "group"
+                etnodes.append((etnode, path))
+            elif etnode.tag == "field":
+                nodes[path] = "field"
+            else:
+                nodes[path] = None
+    with _xml_cache_lock:
+        _nodes_cache[key] = nodes
+        while len(_nodes_cache) > XML_CACHE_SIZE:
+            _nodes_cache.popitem(last=False)
+    return nodes
+
+
+def chunk_shape(frame_shape, dtype, chunk_bytes, npoints=None,
+                chunk=None):
+    """ chunk shape of a streamed field
+
+    :param frame_shape: shape of a single stream frame
+    :type frame_shape: :obj:`list` < :obj:`int` >
+    :param dtype: field data type
+    :type dtype: :obj:`str`
+    :param chunk_bytes: chunk size in bytes, if 0 one frame per chunk
+    :type chunk_bytes: :obj:`int`
+    :param npoints: expected number of scan points
+    :type npoints: :obj:`int`
+    :param chunk: user chunk shape or number of frames per chunk
+    :type chunk: :obj:`list` < :obj:`int` > or :obj:`int`
+    :returns: chunk shape
+    :rtype: :obj:`list` < :obj:`int` >
+    """
+    frame = [(dm if dm > 0 else 1) for dm in frame_shape]
+    if isinstance(chunk, (list, tuple)) and len(chunk) == len(frame) + 1:
+        return [max(int(dm), 1) for dm in chunk]
+    if isinstance(chunk, int) and chunk > 0:
+        return [chunk] + frame
+    if not chunk_bytes or chunk_bytes <= 0:
+        return [1] + frame
+    try:
+        itemsize = np.dtype(dtype).itemsize
+    except Exception:
+        itemsize = 0
+    if not itemsize:
+        # variable length strings
+        itemsize = 16
+    frame_bytes = int(np.prod(frame)) * itemsize
+    if frame_bytes >= chunk_bytes:
+        # split large frames along their largest dimensions
+        while frame_bytes > chunk_bytes and max(frame) > 1:
+            idx = frame.index(max(frame))
+            frame[idx] = (frame[idx] + 1) // 2
+            frame_bytes = int(np.prod(frame)) * itemsize
+        return [1] + frame
+    rows = chunk_bytes // frame_bytes
+    if npoints and npoints > 0:
+        rows = min(rows, npoints)
+    else:
+        # unknown scan length: avoid huge chunks for short scans
+        rows = min(rows, MIN_EXTENT_STEP)
+    return [max(int(rows), 1)] + frame
+
+
+def chunk_rows(field):
+    """ number of rows in a chunk of the field
+
+    :param field: h5cpp dataset
+    :type field: :class:`pninexus.h5cpp.node.Dataset`
+    :returns: number of rows in a chunk, 1 if the field is not chunked
+    :rtype: :obj:`int`
+    """
+    dcpl = field.creation_list
+    if dcpl.layout == h5cpp.property.DatasetLayout.CHUNKED:
+        return int(dcpl.chunk[0])
+    return 1
+
+
+def data_filters(compression):
+    """ create HDF5 filters from a compression description, e.g.
+    "shuffle,deflate:4", "bitshuffle:0:2" or "32004:0"
+
+    :param compression: comma separated filters with ':' separated
+                        parameters
+    :type compression: :obj:`str`
+    :returns: h5cpp filters
+    :rtype: :obj:`list` <:class:`pninexus.h5cpp.filter.Filter`>
+    """
+    filters = []
+    for flt in (compression or "").split(","):
+        flt = flt.strip()
+        if not flt:
+            continue
+        name, *params = flt.split(":")
+        name = name.strip().lower()
+        params = [int(pr) for pr in params]
+        if name in ["deflate", "gzip"]:
+            filters.append(h5cpp.filter.Deflate(params[0] if params else 4))
+        elif name == "shuffle":
+            filters.append(h5cpp.filter.Shuffle())
+        else:
+            fid = FILTER_IDS[name] if name in FILTER_IDS else int(name)
+            if not h5cpp.filter.is_filter_available(fid):
+                raise ValueError("HDF5 filter %s is not available" % name)
+            filters.append(h5cpp.filter.ExternalFilter(fid, params))
+    return filters
+
+
+def chunk_encoder(field):
+    """ create a chunk encoder for direct chunk writes,
+        data are converted to the field data type before encoding
+
+    :param field: h5cpp dataset
+    :type field: :class:`pninexus.h5cpp.node.Dataset`
+    :returns: function encoding chunk data to bytes or None
+              if the field type or filters are not supported
+    :rtype: :obj:`callable`
+    """
+    try:
+        dtype = h5cpp.datatype.to_numpy(field.datatype)
+    except Exception:
+        return None
+    if dtype not in DIRECT_DTYPES:
+        return None
+    itemsize = np.dtype(dtype).itemsize
+    shuffle = False
+    level = None
+    for flt in field.filters():
+        if flt.id == 2 and level is None and not shuffle:
+            shuffle = True
+        elif flt.id == 1 and level is None:
+            level = flt.cd_values[0] if flt.cd_values else 4
+        else:
+            return None
+
+    def encode(values):
+        data = np.ascontiguousarray(values, dtype=dtype).view(np.uint8)
+        if shuffle and itemsize > 1:
+            data = data.reshape(-1, itemsize).T
+        if level is not None:
+            data = np.frombuffer(zlib.compress(data.tobytes(), level),
+                                 dtype=np.uint8)
+        return data.reshape(-1)
+
+    return encode
+
+
+def source_frames(fname, data_path, read_shape=False):
+    """ number of frames in a vds source file
+
+    :param fname: source file name
+    :type fname: :obj:`str`
+    :param data_path: source dataset path
+    :type data_path: :obj:`str`
+    :param read_shape: open the file to read the dataset shape
+    :type read_shape: :obj:`bool`
+    :returns: number of frames, 0 if the file does not exist
+              or None if unknown
+    :rtype: :obj:`int`
+    """
+    try:
+        stat = os.stat(fname)
+    except OSError:
+        return 0
+    if not read_shape:
+        return None
+    key = (fname, data_path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _vds_source_lock:
+        if key in _vds_source_cache and \
+           _vds_source_cache[key][0] == stamp:
+            _vds_source_cache.move_to_end(key)
+            return _vds_source_cache[key][1]
+    try:
+        h5file = h5cpp.file.open(fname, h5cpp.file.AccessFlags.READONLY)
+    except Exception:
+        # e.g. the file is still locked by its writer
+        return None
+    try:
+        root = h5file.root()
+        try:
+            dataset = h5cpp.node.get_node(root, h5cpp.Path(data_path))
+            frames = int(dataset.dataspace.current_dimensions[0])
+            del dataset
+        except Exception:
+            frames = 0
+        del root
+    finally:
+        h5file.close()
+    with _vds_source_lock:
+        _vds_source_cache[key] = (stamp, frames)
+        while len(_vds_source_cache) > VDS_SOURCE_CACHE_SIZE:
+            _vds_source_cache.popitem(last=False)
+    return frames
+
+
 def create_nexus_file(scan,
                       streams,
                       default_nexus_path="/scan{serialno}:NXentry/"
-                      "instrument:NXinstrument/collection"):
+                      "instrument:NXinstrument/collection",
+                      file_options=None):
     """ open nexus file
 
     :param scan: blissdata scan
@@ -117,6 +550,8 @@ def create_nexus_file(scan,
     :type streams: :class:`StreamSet` or :class:`tango.LatestDeviceImpl`
     :param default_nexus_path: default nexus path
     :type default_nexus_path: :obj:`str`
+    :param file_options: extra NXSFile keyword options
+    :type file_options: :obj:`dict` <:obj:`str`, `any`>
     :returns: nexus file object
     :rtype: :obj:`NXSFile`
     """
@@ -143,19 +578,229 @@ def create_nexus_file(scan,
     nxsfl = NXSFile(scan, fpath,
                     streams,
                     default_nexus_path.format(
-                        number=number, serialno=serialno, entryname=entryname))
+                        number=number, serialno=serialno, entryname=entryname),
+                    **(file_options or {}))
     # ?? append mode
     if not fpath.exists():
         nxsfl.create_file_structure()
     return nxsfl
 
 
+class WriteTarget:
+
+    """ streamed field with its extent tracked in memory
+    """
+
+    __slots__ = ("field", "length", "capacity", "selection",
+                 "encode", "chunk_rows", "chunk_offset", "exact")
+
+    def __init__(self, field, encode=None, exact=True):
+        """ constructor
+
+        :param field: h5cpp dataset
+        :type field: :class:`pninexus.h5cpp.node.Dataset`
+        :param encode: chunk encoder for direct chunk writes
+        :type encode: :obj:`callable`
+        :param exact: extend the field only to the written rows
+        :type exact: :obj:`bool`
+        """
+        shape = list(field.dataspace.current_dimensions)
+        #: (:class:`pninexus.h5cpp.node.Dataset`) h5cpp dataset
+        self.field = field
+        #: (:obj:`int`) number of written rows
+        self.length = shape[0]
+        #: (:obj:`int`) number of allocated rows
+        self.capacity = shape[0]
+        block = shape[:]
+        block[0] = 1
+        #: (:class:`pninexus.h5cpp.dataspace.Hyperslab`) reused selection
+        self.selection = h5cpp.dataspace.Hyperslab(
+            offset=[0] * len(shape), block=block)
+        #: (:obj:`callable`) chunk encoder of direct chunk writes
+        self.encode = None
+        #: (:obj:`int`) number of rows in a chunk
+        self.chunk_rows = 0
+        #: (:obj:`list` < :obj:`int` >) reused chunk offset
+        self.chunk_offset = [0] * len(shape)
+        #: (:obj:`bool`) extend the field only to the written rows
+        self.exact = exact
+        if encode is not None and shape:
+            dcpl = field.creation_list
+            if dcpl.layout == h5cpp.property.DatasetLayout.CHUNKED:
+                chunk = list(dcpl.chunk)
+                # only chunks with whole frames are written directly
+                if chunk[1:] == shape[1:]:
+                    self.encode = encode
+                    self.chunk_rows = chunk[0]
+
+    def write(self, values, offset, npoints):
+        """ write rows with the h5cpp type conversion and filters
+
+        :param values: data to write
+        :type values: :class:`numpy.ndarray`
+        :param offset: first row
+        :type offset: :obj:`int`
+        :param npoints: number of rows
+        :type npoints: :obj:`int`
+        """
+        self.selection.offset(0, offset)
+        self.selection.block(0, npoints)
+        self.field.write(values, self.selection)
+
+    def append(self, values, npoints):
+        """ append rows to the field
+
+        :param values: data to write
+        :type values: :class:`numpy.ndarray`
+        :param npoints: number of rows
+        :type npoints: :obj:`int`
+        """
+        length = self.length + npoints
+        if length > self.capacity:
+            capacity = length if self.exact else max(
+                length, 2 * self.capacity, self.capacity + MIN_EXTENT_STEP)
+            self.field.extent(0, capacity - self.capacity)
+            self.capacity = capacity
+        if self.encode is None:
+            self.write(values, self.length, npoints)
+        else:
+            rows = self.chunk_rows
+            # rows up to the first chunk boundary
+            first = min(npoints, -self.length % rows)
+            last = first + (npoints - first) // rows * rows
+            if first:
+                self.write(values[:first], self.length, first)
+            for row in range(first, last, rows):
+                self.chunk_offset[0] = self.length + row
+                self.field.write_chunk(
+                    self.encode(values[row:row + rows]), self.chunk_offset, 0)
+            if last < npoints:
+                self.write(values[last:], self.length + last, npoints - last)
+        self.length = length
+
+    def trim(self):
+        """ shrink the field extent to the written rows
+        """
+        if self.capacity != self.length:
+            self.field.extent(0, self.length - self.capacity)
+            self.capacity = self.length
+
+
+class WritePlanItem:
+
+    """ precomputed write plan of a stream channel
+    """
+
+    __slots__ = ("label", "cursor", "fields", "dtype", "rank", "length")
+
+    def __init__(self, label, cursor, dtype=None, rank=0):
+        """ constructor
+
+        :param label: channel label
+        :type label: :obj:`str`
+        :param cursor: stream cursor
+        :type cursor: :class:`blissdata.streams.Cursor`
+        :param dtype: channel data type
+        :type dtype: :obj:`str`
+        :param rank: field rank
+        :type rank: :obj:`int`
+        """
+        #: (:obj:`str`) channel label
+        self.label = label
+        #: (:class:`blissdata.streams.Cursor`) stream cursor
+        self.cursor = cursor
+        #: (:obj:`list` <:class:`WriteTarget`>) target fields
+        self.fields = []
+        #: (:obj:`str`) channel data type
+        self.dtype = dtype
+        #: (:obj:`int`) field rank
+        self.rank = rank
+        #: (:obj:`int`) number of written points
+        self.length = 0
+
+
+class SnapshotItem:
+
+    """ snapshot item with resolved nexus path
+    """
+
+    __slots__ = ("name", "index", "strategy", "lnxpath", "h5path", "attr",
+                 "dtype", "value", "compression", "attrs")
+
+    def __init__(self, name, item, default_nexus_path=None, index=None):
+        """ constructor
+
+        :param name: snapshot item name
+        :type name: :obj:`str`
+        :param item: element description
+        :type item: :obj:`dict`
+        :param default_nexus_path: default nexus path
+        :type default_nexus_path: :obj:`str`
+        :param index: position in the item list of the name
+                      or None if the name has a single item
+        :type index: :obj:`int`
+        """
+        #: (:obj:`str`) snapshot item name
+        self.name = name
+        #: (:obj:`int`) position in the item list of the name
+        self.index = index
+        #: (:obj:`str`) write strategy
+        self.strategy = item.get("strategy", None)
+        nxpath = item.get('nexus_path', default_nexus_path)
+        #: (:obj:`str`) attribute name or None for fields
+        self.attr = None
+        if nxpath and "@" in nxpath:
+            nxpath, self.attr = nxpath.split("@", 1)
+        #: (:obj:`list` <:obj:`str`>) nexus path list
+        self.lnxpath = nxpath.split("/") if nxpath else []
+        #: (:obj:`str`) hdf5 path
+        self.h5path = "/".join([nd.split(":")[0] for nd in self.lnxpath])
+        #: (:obj:`any`) item value
+        self.value = item.get('value', None)
+        dtype = item.get('dtype', None)
+        if dtype == "string":
+            dtype = "str"
+        #: (:obj:`str`) item data type
+        self.dtype = dtype
+        #: (:obj:`str`) compression filters
+        self.compression = item.get("compression", None)
+        #: (:obj:`dict` <:obj:`str`, `any`>) field attributes
+        self.attrs = {anm: item[anm] for anm in set(item.keys()) - NOATTRS}
+
+
+def equal_values(value1, value2):
+    """  compare values with numpy equality
+
+    :param value1: first value
+    :type value1: :obj:`any`
+    :param value2: second value
+    :type value2: :obj:`any`
+    :returns: True if values are equal
+    :rtype: :obj:`bool`
+    """
+    try:
+        array1 = np.asarray(value1)
+        array2 = np.asarray(value2)
+        if array1.shape != array2.shape:
+            return False
+        if array1.dtype.kind in "fc" and array2.dtype.kind in "fc":
+            return bool(np.array_equal(array1, array2, equal_nan=True))
+        return bool(np.array_equal(array1, array2))
+    except Exception:
+        return str(value1) == str(value2)
+
+
 class NXSFile:
 
     def __init__(self, scan, fpath, streams,
                  default_nexus_path="/scan{serialno}:NXentry/"
                  "instrument:NXinstrument/collection",
-                 max_write_interval=1):
+                 min_write_latency=1, max_write_latency=1,
+                 batch_read=False, chunk_bytes=1048576, compression="",
+                 direct_chunk_write=False, skeleton_dir="", libver="",
+                 swmr=False, swmr_flush_time=1, vds_check="",
+                 write_block_points=0, preallocate=False,
+                 single_file_formats=""):
         """ constructor
 
         :param scan: blissdata scan
@@ -166,9 +811,50 @@ class NXSFile:
         :type streams: :class:`StreamSet` or :class:`tango.LatestDeviceImpl`
         :param default_nexus_path: default nexus path
         :type default_nexus_path: :obj:`str`
-        :param max_write_interval: max write interval
-        :type max_write_interval: :obj:`int`
+        :param min_write_latency: minimal time between writes in seconds
+        :type min_write_latency: :obj:`float`
+        :param max_write_latency: maximal time between writes in seconds
+        :type max_write_latency: :obj:`float`
+        :param batch_read: read all stream cursors in one redis call
+        :type batch_read: :obj:`bool`
+        :param chunk_bytes: chunk size of streamed fields in bytes,
+                            if 0 one frame per chunk
+        :type chunk_bytes: :obj:`int`
+        :param compression: default compression filters of chunked fields
+        :type compression: :obj:`str`
+        :param direct_chunk_write: write whole chunks of streamed frames
+                                   directly, bypassing the HDF5 pipeline
+        :type direct_chunk_write: :obj:`bool`
+        :param skeleton_dir: cache directory of skeleton files
+                             copied to new scan files, if empty disabled
+        :type skeleton_dir: :obj:`str`
+        :param libver: hdf5 library version bounds, i.e. 'earliest',
+                       'latest' or 'low:high', if empty hdf5 defaults
+        :type libver: :obj:`str`
+        :param swmr: write streamed fields in the SWMR mode
+                     readable by live readers
+        :type swmr: :obj:`bool`
+        :param swmr_flush_time: minimal time between file flushes
+                                in the SWMR mode in seconds
+        :type swmr_flush_time: :obj:`float`
+        :param vds_check: check of vds source files, i.e. 'stat' for
+                          existing files, 'open' for their frame numbers,
+                          if empty disabled
+        :type vds_check: :obj:`str`
+        :param write_block_points: number of scan points in a write block
+                                   of fast scans, if 0 the largest number
+                                   of chunk rows of streamed fields
+        :type write_block_points: :obj:`int`
+        :param preallocate: grow streamed fields in large steps,
+                            live readers see fill values past the written
+                            rows until the fields are trimmed at the end
+        :type preallocate: :obj:`bool`
+        :param single_file_formats: comma separated 'plugin:format' pairs
+                                    of streams with all frames in one hdf5
+                                    file given by its stream info
+        :type single_file_formats: :obj:`str`
         """
+        register_single_file_formats(single_file_formats)
         self.__scan = scan
         self.__fpath = fpath
         #: (:class:`StreamSet` or :class:`tango.LatestDeviceImpl`) stream set
@@ -176,12 +862,57 @@ class NXSFile:
         self.__default_nexus_path = default_nexus_path
         self.__mfile = None
         self.__cursors = {}
+        self.__plan = []
+        self.__cursor_group = None
+        self.__group_eos = set()
+        self.__batch_read = batch_read and CursorGroup is not None
         self.__nxfields = {}
-        self.__lbnames = {}
-        self.__last_write_time = 0
-        self.__max_write_interval = max_write_interval
+        self.__groups = {}
+        self.__nodes = None
+        self.__spaces = {}
+        self.__snapshots = {"INIT": [], "FINAL": []}
+        self.__scheduler = FlushScheduler(
+            min_write_latency, max_write_latency)
+        self.__write_block_points = write_block_points
+        self.__chunk_bytes = chunk_bytes
+        self.__compression = compression
+        self.__filters = {}
+        self.__direct_chunk_write = direct_chunk_write
+        self.__skeleton_dir = skeleton_dir
+        self.__swmr = swmr
+        self.__preallocate = preallocate
+        self.__swmr_flush_time = swmr_flush_time
+        self.__swmr_mode = False
+        self.__flush_time = 0
+        if swmr and not libver:
+            # SWMR needs the latest file format
+            libver = "latest"
+        self.__libver = libver
+        self.__fapl = self.file_access_list(libver)
         self.__vds = {}
-        self.__vds_plugins = ["lima"]
+        self.__vds_check = (vds_check or "").lower()
+
+    def file_access_list(self, libver):
+        """ create file access property list
+
+        :param libver: hdf5 library version bounds, i.e. 'earliest',
+                       'latest' or 'low:high', if empty hdf5 defaults
+        :type libver: :obj:`str`
+        :returns: file access property list
+        :rtype: :class:`pninexus.h5cpp.property.FileAccessList`
+        """
+        fapl = h5cpp.property.FileAccessList()
+        if libver:
+            try:
+                bounds = libver.lower().split(":")
+                fapl.library_version_bounds(
+                    LIBVERSIONS[bounds[0].strip()],
+                    LIBVERSIONS[bounds[-1].strip()])
+            except Exception as e:
+                self._streams.warn(
+                    "NXSFile::file_access_list() - %s: %s"
+                    % (libver, str(e)))
+        return fapl
 
     @functools.cached_property
     def channels(self):
@@ -207,6 +938,8 @@ class NXSFile:
         """
         si = self.__scan.info
         filename = str(self.__fpath.absolute())
+        self.__groups = {}
+        self.__nodes = {}
         snapshot = {}
         if "snapshot" in si:
             snapshot = si["snapshot"]
@@ -218,110 +951,334 @@ class NXSFile:
                 "NXSFile::create_file_structure( )- %s" % (str(e)))
             xmlc = None
         if xmlc:
-            xmlc1 = xmlc.replace('"NX_DATE_TIME"', '"NX_CHAR"')
-            xmlc2 = xmlc1.replace('index="1"', 'index="0"').replace(
-                'index="2"', 'index="1"').replace('index="3"', 'index="2"')
-            etroot = et.fromstring(
-                xmlc2, parser=XMLParser(collect_ids=False))
-            etdims = etroot.findall(".//dimensions")
-            for etdim in etdims:
-                dparent = etdim.getparent()
-                if dparent.tag in ["field", "vds"]:
-                    ddparent = dparent.getparent()
-                    ddparent.remove(dparent)
-            xmls = etree.tostring(etroot, encoding='unicode',
-                                  method='xml', pretty_print=True)
+            key, xmls = xml_template(xmlc)
+            try:
+                nodes = xml_nodes(key, xmls)
+                self.__nodes = dict(nodes) if nodes is not None else None
+            except Exception as e:
+                self.__nodes = None
+                self._streams.warn(
+                    "NXSFile::create_file_structure() - "
+                    "node index: %s" % (str(e)))
+            if self.__skeleton_dir:
+                try:
+                    self.__mfile = self.clone_skeleton(filename, key, xmls)
+                    return
+                except Exception as e:
+                    self._streams.warn(
+                        "NXSFile::create_file_structure() - "
+                        "skeleton file: %s" % (str(e)))
         self.__mfile = nexus.create_file(filename,
-                                         h5cpp.file.AccessFlags.TRUNCATE)
+                                         h5cpp.file.AccessFlags.TRUNCATE,
+                                         fapl=self.__fapl)
         root = self.__mfile.root()
         if xmls:
             nexus.create_from_string(root, xmls)
 
-    def write_init_snapshot(self):
-        """ write init data
+    def clone_skeleton(self, filename, key, xmls):
+        """ create nexus file from a copy of the skeleton file
+
+        :param filename: nexus file name
+        :type filename: :obj:`str`
+        :param key: xml hash
+        :type key: :obj:`str`
+        :param xmls: file structure xml
+        :type xmls: :obj:`str`
+        :returns: nexus file
+        :rtype: :class:`pninexus.h5cpp.file.File`
+        """
+        skey, spath, entries = self.skeleton_file(key, xmls)
+        shutil.copyfile(spath, filename)
+        mfile = h5cpp.file.open(filename, h5cpp.file.AccessFlags.READWRITE,
+                                self.__fapl)
+        try:
+            root = mfile.root()
+            links = _skeleton_links.get(skey)
+            if links is None:
+                links = soft_links(root)
+                _skeleton_links[skey] = links
+            names = {}
+            for ie, name in enumerate(entries):
+                sname = SKELETON_ENTRY % ie
+                names["/%s" % sname] = "/%s" % name
+                h5cpp.node.move(
+                    root.get_group(sname), root, h5cpp.Path(name))
+            for gpath, name, target in links:
+                spref = "/%s" % target[1:].split("/")[0]
+                if spref not in names:
+                    continue
+                gpref = "/%s" % gpath[1:].split("/")[0]
+                if gpref in names:
+                    gpath = names[gpref] + gpath[len(gpref):]
+                grp = h5cpp.node.get_node(root, h5cpp.Path(gpath))
+                h5cpp.node.remove(base=grp, path=h5cpp.Path(name))
+                h5cpp.node.link(
+                    h5cpp.Path(names[spref] + target[len(spref):]),
+                    grp, h5cpp.Path(name))
+            ftime = datetime.datetime.now(datetime.timezone.utc).strftime(
+                "%Y-%m-%dT%H:%M:%S.%f%z")
+            for name, value in [("file_name", filename),
+                                ("file_time", ftime),
+                                ("file_update_time", ftime)]:
+                if root.attributes.exists(name):
+                    root.attributes[name].write(value)
+        except Exception:
+            mfile.close()
+            raise
+        return mfile
+
+    def skeleton_file(self, key, xmls):
+        """ find skeleton file in the cache directory
+            or create it if it does not exist
+
+        :param key: xml hash
+        :type key: :obj:`str`
+        :param xmls: file structure xml
+        :type xmls: :obj:`str`
+        :returns: skeleton hash, skeleton file path and entry names
+        :rtype: :obj:`tuple` <:obj:`str`, :obj:`str`, :obj:`list`>
+        """
+        skey, template, entries = skeleton_template(key, xmls)
+        if self.__libver:
+            skey = "%s.%s" % (
+                skey, self.__libver.lower().replace(":", "_"))
+        spath = os.path.join(self.__skeleton_dir, "%s.nxs" % skey)
+        if os.path.isfile(spath):
+            os.utime(spath)
+        else:
+            self.create_skeleton(spath, template)
+        return skey, spath, entries
+
+    def prefetch_structure(self):
+        """ build the cached file structure of the scan xml
+            and its skeleton file without creating the scan file
+
+        :returns: True if the scan info contains the structure xml
+        :rtype: :obj:`bool`
+        """
+        try:
+            xmlc = self.__scan.info["snapshot"][
+                "nxsdatawriter_xmlsettings"]["value"]
+        except Exception:
+            return False
+        if not xmlc:
+            return False
+        key, xmls = xml_template(xmlc)
+        xml_nodes(key, xmls)
+        if self.__skeleton_dir:
+            self.skeleton_file(key, xmls)
+        return True
+
+    def create_skeleton(self, spath, template):
+        """ create skeleton file in the cache directory
+
+        :param spath: skeleton file path
+        :type spath: :obj:`str`
+        :param template: skeleton xml
+        :type template: :obj:`str`
+        """
+        os.makedirs(self.__skeleton_dir, exist_ok=True)
+        tpath = "%s.%s.%s.tmp" % (spath, os.getpid(), threading.get_ident())
+        sfile = nexus.create_file(tpath, h5cpp.file.AccessFlags.TRUNCATE,
+                                  fapl=self.__fapl)
+        try:
+            nexus.create_from_string(sfile.root(), template)
+        finally:
+            sfile.close()
+        os.replace(tpath, spath)
+        self._streams.info(
+            "NXSFile::create_skeleton() - %s" % spath)
+        try:
+            spaths = [os.path.join(self.__skeleton_dir, fn)
+                      for fn in os.listdir(self.__skeleton_dir)
+                      if fn.endswith(".nxs")]
+            spaths.sort(key=os.path.getmtime)
+            for sp in spaths[:-SKELETON_CACHE_SIZE]:
+                os.remove(sp)
+        except Exception as e:
+            self._streams.warn(
+                "NXSFile::create_skeleton() - %s" % (str(e)))
+
+    def partition_snapshot(self):
+        """ split the scan snapshot into INIT and FINAL item lists
+            in one pass
+
+        :returns: True if the snapshot was found
+        :rtype: :obj:`bool`
         """
+        self.__snapshots = {"INIT": [], "FINAL": []}
         si = self.__scan.info
-        root = self.__mfile.root()
-        snapshot = {}
-        if "snapshot" in si:
-            snapshot = si["snapshot"]
-        for ds, items in snapshot.items():
+        if "snapshot" not in si:
+            return False
+        for ds, items in si["snapshot"].items():
+            indexes = range(len(items)) if isinstance(items, list) else [None]
             if not isinstance(items, list):
                 items = [items]
-            for item in items:
-                strategy = None
-                if "strategy" in item:
-                    strategy = item["strategy"]
-                if not strategy or strategy in ["INIT"]:
-                    try:
-                        # print("WRITE", ds, strategy)
-                        self.write_snapshot_item(
-                            root, item,
-                            "%s/%s" % (self.__default_nexus_path, ds))
-                    except Exception as e:
-                        self._streams.error(
-                            "NXSFile::write_init_snapshot() %s %s %s %s"
-                            % (ds, strategy, item, str(e)))
-                        break
-            else:
-                continue
-            break
+            dpath = "%s/%s" % (self.__default_nexus_path, ds)
+            for index, item in zip(indexes, items):
+                strategy = item.get("strategy", None) or "INIT"
+                if strategy not in self.__snapshots:
+                    continue
+                try:
+                    sitem = SnapshotItem(ds, item, dpath, index)
+                except Exception as e:
+                    self._streams.error(
+                        "NXSFile::partition_snapshot() %s %s %s %s"
+                        % (ds, strategy, item, str(e)))
+                    continue
+                if sitem.lnxpath and (
+                        strategy == "FINAL" or sitem.value is not None):
+                    self.__snapshots[strategy].append(sitem)
+        return True
+
+    def update_final_snapshot(self):
+        """ update values of the FINAL items from the scan info
+            reloaded at the scan end
+        """
+        snapshot = self.__scan.info.get("snapshot") or {}
+        sitems = []
+        for sitem in self.__snapshots["FINAL"]:
+            try:
+                item = snapshot[sitem.name]
+                if sitem.index is not None:
+                    item = item[sitem.index]
+                sitem.value = item.get("value", sitem.value)
+            except Exception:
+                # e.g. the item has been removed from the snapshot
+                pass
+            if sitem.value is not None:
+                sitems.append(sitem)
+        self.__snapshots["FINAL"] = sitems
+
+    def write_snapshot_items(self, strategy):
+        """ write snapshot items of the given strategy
+
+        :param strategy: write strategy, i.e. INIT or FINAL
+        :type strategy: :obj:`str`
+        """
+        root = self.__mfile.root()
+        sitems = self.__snapshots.get(strategy, [])
+        self.__snapshots[strategy] = []
+        for sitem in sitems:
+            try:
+                # print("WRITE", sitem.name, strategy)
+                self.write_snapshot_item(root, sitem)
+            except Exception as e:
+                self._streams.error(
+                    "NXSFile::write_snapshot_items() %s %s %s %s"
+                    % (sitem.name, strategy, "/".join(sitem.lnxpath),
+                       str(e)))
+                break
+
+    def write_init_snapshot(self):
+        """ write init data
+        """
+        # INIT items are written before the channels are prepared
+        self.partition_snapshot()
+        self.write_snapshot_items("INIT")
 
     def prepareChannels(self):
         """ prepare cursors
         """
         self.__cursors = {}
         self.__nxfields = {}
+        plan = {}
+        streamed = set()
+        npoints = self.__scan.info.get("npoints", None)
+        if not isinstance(npoints, int):
+            npoints = None
         #         for key, stream in self.__scan.streams.items():
         # -           self.__cursors[key] = stream.cursor()
         for ch in self.channels:
             key = ch["label"]
             name = ch.get("name", key)
-            if key in self.__lbnames:
-                self.__lbnames[key].append(name)
-            else:
-                self.__lbnames[key] = [name]
             # print("CH", key, list(self.__scan.streams.keys()))
             nxpath = ch.get(
                 'nexus_path',
                 "%s/%s" % (self.__default_nexus_path, key))
             lnxpath = nxpath.split("/")
             h5path = "/".join([nd.split(":")[0] for nd in lnxpath])
-            if key in list(self.__scan.streams.keys()):
+            if key in self.__scan.streams:
                 stream = self.__scan.streams[key]
-                self.__cursors[key] = stream.cursor()
                 shape = [0] + list(stream.shape)
-                chunk = [1] + list(stream.shape)
                 dtype = str(stream.dtype)
                 if hasattr(dtype, "__name__"):
                     dtype = str(dtype.__name__)
                 if dtype == "string":
                     dtype = "str"
+                chunk = chunk_shape(
+                    list(stream.shape), dtype, self.__chunk_bytes,
+                    npoints, ch.get("chunk", None))
+                if key not in plan:
+                    self.__cursors[key] = stream.cursor()
+                    plan[key] = WritePlanItem(
+                        key, self.__cursors[key], dtype)
                 root = self.__mfile.root()
                 dataset = None
-                try:
-                    self.__nxfields[name] = root.get_dataset(h5path)
-                    dataset = self.__nxfields[name]
-                except Exception as e:
-                    if str(e).startswith("No node ["):
-                        # print("S", key, shape, chunk, stream.dtype, ch)
-                        if stream.plugin in self.__vds_plugins:
-                            self.__vds[key] = {
-                                "nxpath": lnxpath, "dtype": dtype}
+                created = False
+                missing = self.node_exists(h5path) is False
+                if not missing:
+                    try:
+                        self.__nxfields[name] = root.get_dataset(h5path)
+                        dataset = self.__nxfields[name]
+                    except Exception as e:
+                        if str(e).startswith("No node ["):
+                            missing = True
+                        elif str(e).startswith("Node ["):
+                            self._streams.warn(
+                                "NXSFile::prepareChannels() - %s"
+                                % (str(e)))
                         else:
-                            self.__nxfields[name] = self.create_groupfield(
-                                root, lnxpath, dtype, value=None,
-                                shape=shape, chunk=chunk)
-                            dataset = self.__nxfields[name]
-                    elif str(e).startswith("Node ["):
-                        self._streams.warn(
-                            "NXSFile::prepareChannels() - %s" % (str(e)))
-
+                            self._streams.error(
+                                "NXSFile::prepareChannels() - %s"
+                                % (str(e)))
+                            raise
+                if missing:
+                    # print("S", key, shape, chunk, stream.dtype, ch)
+                    if has_plugin(stream.plugin):
+                        self.__vds[key] = {
+                            "nxpath": lnxpath, "dtype": dtype}
+                        self.create_live_vds(
+                            key, stream, lnxpath, dtype, ch)
                     else:
-                        self._streams.error(
-                            "NXSFile::prepareChannels() - %s" % (str(e)))
-                        raise
-                self.add_attributes(dataset, ch)
+                        self.__nxfields[name] = self.create_groupfield(
+                            root, lnxpath, dtype, value=None,
+                            shape=shape, chunk=chunk,
+                            compression=ch.get(
+                                "compression", self.__compression))
+                        dataset = self.__nxfields[name]
+                        created = True
+                if "stream" in ch and ch["stream"] not in ["stream"]:
+                    self._streams.info(
+                        "NXSFile::prepareChannels() - "
+                        "SKIP {}".format(key))
+                else:
+                    streamed.add(key)
+                    if dataset is not None and dataset.dataspace.type != \
+                            h5cpp.dataspace.Type.SCALAR:
+                        plan[key].rank = dataset.dataspace.rank
+                        plan[key].fields.append(WriteTarget(
+                            dataset,
+                            chunk_encoder(dataset)
+                            if self.__direct_chunk_write else None,
+                            self.__swmr or not self.__preallocate))
+                self.add_attributes(dataset, ch, created)
+        # labels with only skipped channels are not read
+        for key in set(plan) - streamed:
+            plan.pop(key)
+            self.__cursors.pop(key, None)
+        self.__plan = list(plan.values())
+        rows = [chunk_rows(target.field)
+                for item in self.__plan for target in item.fields]
+        if self.__write_block_points > 0:
+            self.__scheduler.block_points = self.__write_block_points
+        elif rows:
+            # fast scans are written in whole chunks
+            self.__scheduler.block_points = max(rows)
+        if self.__batch_read and self.__cursors:
+            self.__group_eos = set()
+            self.__cursor_group = CursorGroup(
+                [self.__scan.streams[key] for key in self.__cursors.keys()])
 
     def updateVDS(self):
         """ prepare cursors
@@ -347,17 +1304,24 @@ class NXSFile:
                 self._streams.error(
                     "NXSFile::prepareChannels() - %s" % (str(e)))
 
-    def add_attributes(self, dataset, item):
+    def add_attributes(self, dataset, item, created=False):
         """ add dataset attribute
 
         :param dataset: h5cpp dataset
         :type dataset: :class:`pninexus.h5cpp.node.Dataset`
         :param item: channel descrition
         :type item: :obj:`dict` <:obj:`str`, `any`>
+        :param created: dataset has been just created without attributes
+        :type created: :obj:`bool`
         """
         if dataset is not None:
             attrs = set(item.keys()) - NOATTRS
+            if not attrs:
+                return
             am = dataset.attributes
+            names = set()
+            if not created:
+                names = set(att.name for att in am)
             for anm in attrs:
                 avl = item[anm]
                 if isinstance(avl, list):
@@ -371,113 +1335,242 @@ class NXSFile:
                     dtp = str(type(avl).__name__)
                 nanm = ATTRDESC.get(anm, anm)
                 try:
-                    self.write_attr(am, nanm, dtp, avl, item)
+                    self.write_attr(am, nanm, dtp, avl, item, names)
                 except Exception as e:
                     self._streams.error(
                         "NXSFile::prepareChannels() "
                         "- %s %s %s %s %s %s"
                         % (am, nanm, dtp, avl, item, str(e)))
 
-    def write_scan_points(self):
+    def write_delay(self):
+        """ time to the next allowed write
+
+        :returns: time to the next write in seconds
+        :rtype: :obj:`float`
+        """
+        return self.__scheduler.delay()
+
+    def write_scan_points(self, timeout=None):
         """ write step data
+
+        :param timeout: maximal wait time for new data in seconds,
+                        if None it waits for each channel up to READ_TIMEOUT
+        :type timeout: :obj:`float`
         """
         now = time.monotonic()
-        if (now - self.__last_write_time) < self.__max_write_interval:
+        if not self.__scheduler.due(now):
             return
+        self.write_points(self.read_scan_points(timeout), now)
+
+    def read_scan_points(self, timeout=None):
+        """ read new step data from the stream cursors
 
+        :param timeout: maximal wait time for new data in seconds,
+                        if None it waits for each channel up to READ_TIMEOUT
+        :type timeout: :obj:`float`
+        :returns: write plan items with their new data
+        :rtype: :obj:`list` <(:class:`WritePlanItem`,
+                :class:`numpy.ndarray`)>
+        """
         rs = set()
+        points = []
         eos = set()
-        eose = None
-        for ch in self.channels:
-            if "stream" in ch and ch["stream"] not in ["stream"]:
-                self._streams.info(
-                    "NXSFile::write_scan_point() - "
-                    "SKIP {}".format(ch["label"]))
-                continue
+        ended = False
+        views = None
+        wait = True
+        if self.__cursor_group is not None:
+            views, eos, ended = self.read_cursor_group(timeout)
+        for item in self.__plan:
+            label = item.label
             try:
-                if ch["label"] in eos:
+                if label in eos:
                     continue
-                val = self.__cursors[ch["label"]].read()
-                rs.add(ch["label"])
-            except EndOfStream as e:
+                if views is not None:
+                    val = views.get(label)
+                elif timeout is None:
+                    val = item.cursor.read(timeout=READ_TIMEOUT)
+                else:
+                    # wait only for the first channel,
+                    # the other ones are published together with it
+                    val = item.cursor.read(block=wait, timeout=timeout)
+                    wait = False
+                rs.add(label)
+            except EndOfStream:
                 self._streams.debug(
-                    "NXSFile::write_scan_point() - "
-                    "End of stream for ct column {}".format(ch))
-                eose = e
-                eos.add(ch["label"])
+                    "NXSFile::read_scan_points() - "
+                    "End of stream for ct column {}".format(label))
+                # the exception is not kept as its traceback references
+                # the write plan with the field handles
+                ended = True
+                eos.add(label)
+                continue
+            if val is None or not item.fields:
                 continue
-                # raise
             try:
-                try:
-                    key = ch["label"]
-                    values = val.get_data()
-                except Exception as e:
-                    print(str(e))
-                    continue
-                # print("CHANNEL", ch["label"], ch["shape"], values)
-                npoints = len(values)
-                for name in self.__lbnames.get(key, [key]):
-                    if npoints:
-                        oldshape = \
-                            self.__nxfields[name].dataspace.current_dimensions
-                        rank = len(oldshape)
-                        if rank:
-                            offset = [0] * rank
-                            block = list(oldshape)
-                            offset[0] = oldshape[0]
-                            block[0] = npoints
-                            selection = h5cpp.dataspace.Hyperslab(
-                                offset=offset, block=block)
-                            self.__nxfields[name].extent(0, npoints)
-                            # print(self.__nxfields[name].dataspace.current_dimensions)
-                            # print(offset, block)
-                            self.__nxfields[name].write(values, selection)
+                values = val.get_data()
+                # print("CHANNEL", label, values)
+                if len(values):
+                    points.append((item, values))
             except Exception as e:
                 self._streams.error(
-                    "NXSFile::write_scan_points()- %s %s %s %s"
-                    % (ch, key, values, str(e)))
-        # npoints = len(values[0])
-
-        # for i in range(npoints):
-        self.__last_write_time = now
+                    "NXSFile::read_scan_points()- %s %s"
+                    % (label, str(e)))
         if not len(rs):
             self._streams.info(
-                "NXSFile::write_scan_point() - "
+                "NXSFile::read_scan_points() - "
                 "End of stream for all columns: %s" % (str(eos)))
-            if eose is not None:
-                raise eose
+            if ended:
+                raise EndOfStream("End of stream for all columns")
             else:
                 raise EndOfStream("No active channels")
+        return points
+
+    def write_points(self, points, now=None):
+        """ write step data to the streamed fields
+
+        :param points: write plan items with their new data
+        :type points: :obj:`list` <(:class:`WritePlanItem`,
+                      :class:`numpy.ndarray`)>
+        :param now: monotonic time of the write
+        :type now: :obj:`float`
+        """
+        if now is None:
+            now = time.monotonic()
+        maxpoints = 0
+        write_time = 0
+        for item, values in points:
+            try:
+                npoints = len(values)
+                maxpoints = max(maxpoints, npoints)
+                wstart = time.monotonic()
+                for target in item.fields:
+                    target.append(values, npoints)
+                item.length += npoints
+                write_time += time.monotonic() - wstart
+            except Exception as e:
+                self._streams.error(
+                    "NXSFile::write_points()- %s %s %s"
+                    % (item.label, values, str(e)))
+        if self.__swmr_mode and maxpoints and \
+                now - self.__flush_time >= self.__swmr_flush_time:
+            try:
+                self.__mfile.flush(h5cpp.file.Scope.LOCAL)
+                self.__flush_time = now
+            except Exception as e:
+                self._streams.error(
+                    "NXSFile::write_points()- flush %s" % (str(e)))
+        self.__scheduler.update(maxpoints, write_time, now)
+
+    def start_swmr(self):
+        """ reopen the file in the SWMR write mode
+            if the SWMR mode is enabled
+        """
+        if not self.__swmr or self.__swmr_mode:
+            return
+        self.trim_fields()
+        self.reopen_file(True)
+        self.__swmr_mode = True
+        self.__flush_time = time.monotonic()
+        self._streams.info(
+            "NXSFile::start_swmr() - %s" % self.__fpath)
+
+    def stop_swmr(self):
+        """ reopen the file in the normal write mode
+            if it is in the SWMR write mode
+        """
+        if not self.__swmr_mode:
+            return
+        self.reopen_file(False)
+        self.__swmr_mode = False
+
+    def reopen_file(self, swmr=False):
+        """ close and open the file again with reopened streamed fields
+
+        :param swmr: open the file in the SWMR write mode
+        :type swmr: :obj:`bool`
+        """
+        # all h5cpp handles have to be released to close the file
+        fields = {name: str(field.link.path)
+                  for name, field in self.__nxfields.items()}
+        targets = []
+        for item in self.__plan:
+            for target in item.fields:
+                targets.append((target, str(target.field.link.path)))
+                target.field = None
+        self.__nxfields = {}
+        self.__groups = {}
+        root = self.__mfile.root()
+        root.close()
+        self.__mfile.close()
+        self.__mfile = None
+        flags = h5cpp.file.AccessFlags.READWRITE
+        if swmr:
+            flags = int(flags) | int(h5cpp.file.AccessFlags.SWMRWRITE)
+        self.__mfile = h5cpp.file.open(
+            str(self.__fpath.absolute()), flags, self.__fapl)
+        root = self.__mfile.root()
+        for name, path in fields.items():
+            self.__nxfields[name] = root.get_dataset(path)
+        for target, path in targets:
+            target.field = root.get_dataset(path)
+
+    def trim_fields(self):
+        """ shrink streamed fields to their written length
+        """
+        for item in self.__plan:
+            for target in item.fields:
+                try:
+                    target.trim()
+                except Exception as e:
+                    self._streams.error(
+                        "NXSFile::trim_fields() - %s %s"
+                        % (item.label, str(e)))
+
+    def read_cursor_group(self, timeout=None):
+        """ read all stream cursors at once
+
+        :param timeout: maximal wait time for new data in seconds,
+                        if None it waits until data come
+        :type timeout: :obj:`float`
+        :returns: views of channel labels, labels of finished streams
+                  and if the cursor group reached its end
+        :rtype: :obj:`tuple` <:obj:`dict` <:obj:`str`, `any`>,
+                :obj:`set` <:obj:`str`>, :obj:`bool`>
+        """
+        ended = False
+        views = {}
+        if timeout is None:
+            # a blocking read without timeout never returns at the scan end
+            timeout = READ_TIMEOUT
+        try:
+            views = {stream.name: view for stream, view
+                     in self.__cursor_group.read(timeout=timeout).items()}
+        except EndOfStream:
+            ended = True
+            self.__group_eos.update(
+                stream.name for stream in self.__cursor_group.position)
+        if not views and not ended:
+            # sealed streams read to their ends are finished
+            for stream, position in self.__cursor_group.position.items():
+                if stream.name not in self.__group_eos and \
+                        stream.is_sealed() and position >= len(stream):
+                    self.__group_eos.add(stream.name)
+        eos = set(self.__group_eos)
+        if eos:
+            self._streams.debug(
+                "NXSFile::read_cursor_group() - "
+                "End of stream for ct columns {}".format(eos))
+        return views, eos, ended
 
     def write_final_snapshot(self):
         """ write final data
         """
-        root = self.__mfile.root()
+        self.stop_swmr()
+        self.trim_fields()
+        # the scan info is reloaded at the scan end with final values
+        self.update_final_snapshot()
+        self.write_snapshot_items("FINAL")
         si = self.__scan.info
-        snapshot = {}
-        if "snapshot" in si:
-            snapshot = si["snapshot"]
-        for ds, items in snapshot.items():
-            if not isinstance(items, list):
-                items = [items]
-            for item in items:
-                strategy = None
-                if "strategy" in item:
-                    strategy = item["strategy"]
-                if strategy in ["FINAL"]:
-                    try:
-                        # print("WRITE", ds, strategy)
-                        self.write_snapshot_item(
-                            root, item,
-                            "%s/%s" % (self.__default_nexus_path, ds))
-                    except Exception as e:
-                        self._streams.error(
-                            "NXSFile::write_final_snapshot() %s %s %s %s"
-                            % (ds, strategy, item, str(e)))
-                        break
-            else:
-                continue
-            break
         if "datadesc" not in si:
             return
         ddesc = si["datadesc"]
@@ -498,44 +1591,92 @@ class NXSFile:
             else:
                 shape = [len(stream)] + list(stream.shape)
             vmaps = []
-            if stream.info["format"] in ["lima_v1"]:
-                linfo = stream.info["lima_info"]
-                fp = linfo["file_path"]
-                fn = self.__fpath
-                common_prefix = os.path.commonprefix(
-                    [os.path.split(fn)[0], fp])
-                if common_prefix in ["/", "", os.sep]:
-                    tfn = os.path.splitext(fn)
-                    ofp = fp.split(os.sep)
-                    file_pattern = os.sep.join([tfn[0], key, ofp[-1]])
-                else:
-                    file_pattern = os.path.relpath(fp, common_prefix)
-
-                frame_per_acquisition = linfo["frame_per_acquisition"]
-                # acquisition_offset = linfo["acquisition_offset"]
-                file_offset = linfo["file_offset"]
-                file_format = linfo["file_format"]
-                data_path = linfo["data_path"]
-                frame_per_file = linfo["frame_per_file"]
-                vmaps = self.generate_vmaps(
-                    shape,
-                    frame_per_acquisition,
-                    file_offset,
-                    file_format,
-                    file_pattern,
-                    data_path,
-                    frame_per_file)
+            handler = None
+            if stream is not None:
+                handler = data_handler(
+                    stream.plugin, stream.info.get("format"))
+            if handler is not None:
+                vmaps = handler.vmaps(
+                    key, stream.info, shape, self.__fpath,
+                    self.check_sources if self.__vds_check else None)
+                if vmaps and vmaps[0]["class"] == "VirtualDataBlocks":
+                    # skip missing frames at the end
+                    vb = vmaps[0]
+                    shape = list(shape)
+                    shape[0] = min(
+                        shape[0],
+                        int((vb["offsets"] + vb["frames"]).max())
+                        if len(vb["frames"]) else 0)
             elif "__vmaps__" in desc:
                 vmaps = desc["__vmaps__"]
             root = self.__mfile.root()
+            if vl.get("live"):
+                # the unlimited live mapping grows with any matching file
+                # so the final vds is always rebuilt with bounded blocks
+                self.__nxfields.pop(key, None)
+                h5cpp.node.remove(
+                    base=self.get_group(root, nxpath[:-1]),
+                    path=h5cpp.Path(nxpath[-1].split(":")[0]))
             # self._streams.info(
             #     "CREATE GROUP %s %s %s %s" % (nxpath, key, dtype, shape))
             self.__nxfields[key] = self.create_groupvds(
                 root, nxpath, dtype, shape, vmaps)
-            self.add_attributes(self.__nxfields[key], desc)
+            self.add_attributes(self.__nxfields[key], desc, True)
+
+    def create_live_vds(self, key, stream, lnxpath, dtype, ch):
+        """ create vds of a referenced data stream growing with files
+            if all files are mapped by one unlimited mapping
+
+        :param key: channel label
+        :type key: :obj:`str`
+        :param stream: detector stream
+        :type stream: :class:`blissdata.streams.BaseStream`
+        :param lnxpath: nexus path list
+        :type lnxpath: :obj:`list` <:obj:`str`>
+        :param dtype: nexus field type
+        :type dtype: :obj:`str`
+        :param ch: channel descrition
+        :type ch: :obj:`dict` <:obj:`str`, `any`>
+        """
+        try:
+            handler = data_handler(stream.plugin, stream.info.get("format"))
+            if handler is None:
+                return
+            vmaps = handler.live_vmaps(
+                key, stream.info, list(stream.shape), self.__fpath)
+            if not vmaps:
+                return
+            root = self.__mfile.root()
+            self.__nxfields[key] = self.create_groupvds(
+                root, lnxpath, dtype, [0] + list(stream.shape), vmaps)
+            self.__vds[key]["live"] = True
+            self.add_attributes(self.__nxfields[key], ch, True)
+        except Exception as e:
+            self._streams.warn(
+                "NXSFile::create_live_vds() - %s %s" % (key, str(e)))
+
+    def get_filters(self, compression):
+        """ get HDF5 filters of the compression description
+
+        :param compression: compression description
+        :type compression: :obj:`str`
+        :returns: h5cpp filters
+        :rtype: :obj:`list` <:class:`pninexus.h5cpp.filter.Filter`>
+        """
+        if not compression:
+            return []
+        if compression not in self.__filters:
+            try:
+                self.__filters[compression] = data_filters(compression)
+            except Exception as e:
+                self._streams.warn(
+                    "NXSFile::get_filters() - %s %s"
+                    % (compression, str(e)))
+                self.__filters[compression] = []
+        return self.__filters[compression]
 
     def create_field(self, grp, name, dtype,
-                     value=None, shape=None, chunk=None):
+                     value=None, shape=None, chunk=None, compression=None):
         """ create field
 
         :param grp: nexus group
@@ -548,6 +1689,8 @@ class NXSFile:
         :type shape: :obj:`list` < :obj:`int` >
         :param chunk: chunk
         :type chunk: :obj:`list` < :obj:`int` >
+        :param compression: compression filters
+        :type compression: :obj:`str`
         :returns: file tree field
         :rtype: :class:`pninexus.h5cpp.node.Dataset`
         """
@@ -570,6 +1713,8 @@ class NXSFile:
             chunk = [(dm if dm != 0 else 1) for dm in shape]
         dcpl.layout = h5cpp.property.DatasetLayout.CHUNKED
         dcpl.chunk = tuple(chunk)
+        for flt in self.get_filters(compression):
+            flt(dcpl)
         field = h5cpp.node.Dataset(
             grp, h5cpp.Path(name), PTH[dtype], dataspace, dcpl=dcpl)
         if value is not None:
@@ -577,7 +1722,8 @@ class NXSFile:
         return field
 
     def create_groupfield(self, root, lnxpath, dtype,
-                          value=None, shape=None, chunk=None):
+                          value=None, shape=None, chunk=None,
+                          compression=None):
         """ create field
 
         :param root: root object
@@ -592,30 +1738,20 @@ class NXSFile:
         :type shape: :obj:`list` < :obj:`int` >
         :param chunk: chunk
         :type chunk: :obj:`list` < :obj:`int` >
+        :param compression: compression filters
+        :type compression: :obj:`str`
         :returns: nexus field
         :rtype: :class:`pninexus.h5cpp.node.Dataset`
         """
-        grp = root
-        for gr in lnxpath[:-1]:
-            gn = gr
-            gt = None
-            if ":" in gr:
-                gn, gt = gr.split(":")
-
-            if grp.has_group(gn):
-                grp = grp.get_group(gn)
-            else:
-                grp = h5cpp.node.Group(grp, gn)
-                if gt is not None:
-                    grp.attributes.create(
-                        "NX_class",
-                        h5cpp.datatype.kVariableString).write(gt)
-            # print(gn)
+        grp = self.get_group(root, lnxpath[:-1])
         name = lnxpath[-1]
         if isinstance(value, list):
             value = np.array(value, dtype=dtype)
         # print("CREATE %s (%s)" % (nxpath, dtype))
-        dataset = self.create_field(grp, name, dtype, value, shape, chunk)
+        dataset = self.create_field(
+            grp, name, dtype, value, shape, chunk, compression)
+        if self.__nodes is not None:
+            self.__nodes[node_path(lnxpath)] = "field"
         return dataset
 
     def add_vmap(self, vfl, vmap):
@@ -636,24 +1772,10 @@ class NXSFile:
         path = vmap["path"]
         sds = eview["dataspace"]
         lds = lview["dataspace"]
-        shape = lds["shape"]
-        eshape = sds["shape"]
-        h5_lds = h5cpp.dataspace.Simple(tuple(shape))
-        h5_sds = h5cpp.dataspace.Simple(tuple(eshape))
-
-        if "selection" in lview:
-            selection = lview["selection"]
-            h5_selection = h5cpp.dataspace.Hyperslab(**selection)
-            h5_lview = h5cpp.dataspace.View(h5_lds, h5_selection)
-        else:
-            h5_lview = h5cpp.dataspace.View(h5_lds)
-
-        if "selection" in eview:
-            usel = eview["selection"]
-            h5_usel = h5cpp.dataspace.Hyperslab(**usel)
-            h5_eview = h5cpp.dataspace.View(h5_sds, h5_usel)
-        else:
-            h5_eview = h5cpp.dataspace.View(h5_sds)
+        h5_lview = self.get_view(
+            lds["shape"], lds.get("maxshape"), lview.get("selection"))
+        h5_eview = self.get_view(
+            sds["shape"], None, eview.get("selection"))
 
         # self._streams.info("ADD %s %s " % (fname, path))
         vfl.add(h5cpp.property.VirtualDataMap(
@@ -661,7 +1783,7 @@ class NXSFile:
 
     def generate_vmaps(self, shape, frame_per_acquisition,
                        file_offset, file_format, file_pattern,
-                       data_path, frame_per_file):
+                       data_path, frame_per_file, check=False):
         """ generate virtual map list
 
         :param shape: shape
@@ -678,60 +1800,160 @@ class NXSFile:
         :type data_path: :obj:`str`
         :param frame_per_file: frame per file
         :type frame_per_file: :obj:`int`
+        :param check: correct the layout by existing source files
+        :type check: :obj:`bool`
         :returns: virtual map list
         :rtype: :obj:`list` <:obj:`dict`>
         """
-        vmaps = []
-        if file_format not in ["hdf5"] or not frame_per_acquisition \
-           or not data_path or not frame_per_file:
-            return vmaps
-        length = shape[0]
-        acq_nb, remaining_scan_frame_nb = divmod(length, frame_per_acquisition)
-        acq_files_nb, last_file_scan_frame_nb = divmod(
-            frame_per_acquisition, frame_per_file)
-        remaining_acq_files_nb, remaining_last_file_scan_frame_nb = divmod(
-            remaining_scan_frame_nb, frame_per_file)
-        acq_frames = [frame_per_file] * acq_files_nb
-        if last_file_scan_frame_nb:
-            acq_frames += [last_file_scan_frame_nb]
-        remaining_frames = [frame_per_file] * remaining_acq_files_nb
-        if remaining_last_file_scan_frame_nb:
-            remaining_frames += [remaining_last_file_scan_frame_nb]
-        frame_nb = []
-        for acq in range(acq_nb):
-            frame_nb.extend(acq_frames)
-        frame_nb.extend(remaining_frames)
-        off = 0
-        for nid, nb in enumerate(frame_nb):
-            vmap = {}
-            fid = file_offset + nid
+        return file_vmaps(
+            shape, frame_per_acquisition, file_offset, file_format,
+            file_pattern, data_path, frame_per_file,
+            self.check_sources if check and self.__vds_check else None)
+
+    def check_sources(self, frame_nb, file_ids, file_pattern, data_path):
+        """ correct numbers of frames by existing vds source files
+
+        :param frame_nb: expected numbers of frames in files
+        :type frame_nb: :class:`numpy.ndarray`
+        :param file_ids: file numbers
+        :type file_ids: :class:`numpy.ndarray`
+        :param file_pattern: file pattern
+        :type file_pattern: :obj:`str`
+        :param data_path: nexus data path
+        :type data_path: :obj:`str`
+        :returns: numbers of frames in files
+        :rtype: :class:`numpy.ndarray`
+        """
+        # relative source files are placed with respect to the vds file
+        fdir = str(self.__fpath.absolute().parent)
+        fnames = []
+        for fid in file_ids.tolist():
+            try:
+                fname = file_pattern % fid
+            except Exception:
+                fname = file_pattern
+            fnames.append(os.path.join(fdir, fname))
+        unique = list(dict.fromkeys(fnames))
+        reader = functools.partial(
+            source_frames, data_path=data_path,
+            read_shape=(self.__vds_check == "open"))
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(VDS_CHECK_WORKERS, len(unique))) as executor:
+            found = dict(zip(unique, executor.map(reader, unique)))
+        frames = np.array(
+            [nb if found[fname] is None else min(nb, found[fname])
+             for nb, fname in zip(frame_nb.tolist(), fnames)],
+            dtype=np.int64)
+        missing = int((frame_nb - frames).sum())
+        if missing:
+            self._streams.warn(
+                "NXSFile::check_sources() - %s: %s frames are missing"
+                % (file_pattern, missing))
+        return frames
+
+    def add_vblocks(self, vfl, vblocks):
+        """ add virtual data maps of file blocks
+
+        :param vfl: virtual data maps
+        :type vfl: :class:`pninexus.h5cpp.property.VirtualDataMaps`
+        :param vblocks: file block layout
+        :type vblocks: :obj:`dict` <:obj:`str`, `any`>
+        """
+        file_pattern = vblocks["filename"]
+        path = h5cpp.Path(vblocks["path"])
+        vshape = list(vblocks["shape"])
+        count = [1] * len(vshape)
+        for nb, off, fid in zip(vblocks["frames"].tolist(),
+                                vblocks["offsets"].tolist(),
+                                vblocks["file_ids"].tolist()):
             try:
                 fname = file_pattern % fid
             except Exception:
                 fname = file_pattern
-            vmap["class"] = "VirtualDataMap"
-            vmap["filename"] = fname
-            vmap["path"] = data_path
-            vshape = shape[:]
             vshape[0] = nb
-            offset = [0] * len(shape)
-            offset[0] = off
-            vmap["view"] = {"class": "View",
-                            "dataspace": {"class": "Simple",
-                                          "shape": vshape},
-                            "selection": {"block": vshape,
-                                          "offset": offset,
-                                          "stride": vshape,
-                                          "count": [1] * len(vshape)
-                                          }
-                            }
-            vmap["sourceview"] = {"class": "View",
-                                  "dataspace": {"class": "Simple",
-                                                "shape": vshape}}
-            off += nb
-            vmaps.append(vmap)
-            # print("VMAP", vmap)
-        return vmaps
+            hyperslab = self.get_hyperslab(
+                vshape, count, vshape, [off] + [0] * (len(vshape) - 1))
+            h5_lview = h5cpp.dataspace.View(
+                self.get_dataspace(vshape), hyperslab)
+            vfl.add(h5cpp.property.VirtualDataMap(
+                h5_lview, str(fname), path, self.get_view(vshape)))
+
+    def get_dataspace(self, shape, maxshape=None):
+        """ get simple dataspace from the dataspace cache
+
+        :param shape: shape
+        :type shape: :obj:`list` < :obj:`int` >
+        :param maxshape: maximal shape
+        :type maxshape: :obj:`list` < :obj:`int` >
+        :returns: simple dataspace
+        :rtype: :class:`pninexus.h5cpp.dataspace.Simple`
+        """
+        key = ("space", tuple(shape),
+               tuple(maxshape) if maxshape is not None else None)
+        space = self.__spaces.get(key)
+        if space is None:
+            if maxshape is not None:
+                space = h5cpp.dataspace.Simple(tuple(shape), tuple(maxshape))
+            else:
+                space = h5cpp.dataspace.Simple(tuple(shape))
+            self.__spaces[key] = space
+        return space
+
+    def get_hyperslab(self, block, count, stride, offset=None):
+        """ get hyperslab from the dataspace cache
+
+        :param block: block shape
+        :type block: :obj:`list` < :obj:`int` >
+        :param count: block counts
+        :type count: :obj:`list` < :obj:`int` >
+        :param stride: block strides
+        :type stride: :obj:`list` < :obj:`int` >
+        :param offset: block offset, zero offset if None
+        :type offset: :obj:`list` < :obj:`int` >
+        :returns: hyperslab with the given offset, valid until
+                  the next call as the cached object is reused
+        :rtype: :class:`pninexus.h5cpp.dataspace.Hyperslab`
+        """
+        key = ("hyperslab", tuple(block), tuple(count), tuple(stride))
+        hyperslab = self.__spaces.get(key)
+        if hyperslab is None:
+            hyperslab = h5cpp.dataspace.Hyperslab(
+                offset=[0] * len(block), block=block, count=count,
+                stride=stride)
+            self.__spaces[key] = hyperslab
+        # views copy their selection so the offset can be reset
+        hyperslab.offset(list(offset or [0] * len(block)))
+        return hyperslab
+
+    def get_view(self, shape, maxshape=None, selection=None):
+        """ get dataspace view from the dataspace cache
+
+        :param shape: shape
+        :type shape: :obj:`list` < :obj:`int` >
+        :param maxshape: maximal shape
+        :type maxshape: :obj:`list` < :obj:`int` >
+        :param selection: hyperslab parameters
+        :type selection: :obj:`dict` <:obj:`str`, :obj:`list`>
+        :returns: dataspace view
+        :rtype: :class:`pninexus.h5cpp.dataspace.View`
+        """
+        sel = None
+        if selection is not None:
+            sel = tuple(sorted(
+                (name, tuple(value) if isinstance(value, list) else value)
+                for name, value in selection.items()))
+        key = ("view", tuple(shape),
+               tuple(maxshape) if maxshape is not None else None, sel)
+        view = self.__spaces.get(key)
+        if view is None:
+            space = self.get_dataspace(shape, maxshape)
+            if selection is not None:
+                view = h5cpp.dataspace.View(
+                    space, h5cpp.dataspace.Hyperslab(**selection))
+            else:
+                view = h5cpp.dataspace.View(space)
+            self.__spaces[key] = view
+        return view
 
     def create_vds(self, grp, name, dtype, shape, vmaps, fillvalue=0):
         """ create field
@@ -754,7 +1976,10 @@ class NXSFile:
 
         vfl = h5cpp.property.VirtualDataMaps()
         for vmap in vmaps:
-            self.add_vmap(vfl, vmap)
+            if vmap.get("class") == "VirtualDataBlocks":
+                self.add_vblocks(vfl, vmap)
+            else:
+                self.add_vmap(vfl, vmap)
         dcpl = h5cpp.property.DatasetCreationList()
         dcpl.set_fill_value(fillvalue, PTH[dtype])
         dataspace = h5cpp.dataspace.Simple(
@@ -765,28 +1990,57 @@ class NXSFile:
 
         return vf
 
-    def create_groupvds(self, root, lnxpath, dtype, shape, vmaps):
-        """ create field
+    def node_exists(self, h5path):
+        """ check in the node path index if the node exists
+
+        :param h5path: hdf5 node path
+        :type h5path: :obj:`str`
+        :returns: True or False if known, otherwise None
+        :rtype: :obj:`bool`
+        """
+        if self.__nodes is None:
+            return None
+        path = "".join("/%s" % nd for nd in h5path.split("/") if nd)
+        if not path:
+            return True
+        if path in self.__nodes:
+            return True if self.__nodes[path] else None
+        while path:
+            path = path.rsplit("/", 1)[0]
+            if path in self.__nodes:
+                return False if self.__nodes[path] == "group" else None
+        return False
+
+    def get_group(self, root, lgpath):
+        """ get or create group with the group path cache
 
         :param root: root object
-        :type root: :class:`nxgroup`
-        :param lnxpath: nexus path list
-        :type lnxpath: :obj:`list` <:obj:`str`>
-        :param dtype: nexus field type
-        :type dtype: :obj:`str`
-        :param shape: shape
-        :type shape: :obj:`list` < :obj:`int` >
-        :returns: nexus field
-        :rtype: :class:`pninexus.h5cpp.node.Dataset`
+        :type root: :class:`pninexus.h5cpp.node.Group`
+        :param lgpath: nexus group path list
+        :type lgpath: :obj:`list` <:obj:`str`>
+        :returns: nexus group
+        :rtype: :class:`pninexus.h5cpp.node.Group`
         """
+        key = tuple(lgpath)
+        grp = self.__groups.get(key)
+        if grp is not None:
+            return grp
         grp = root
-        for gr in lnxpath[:-1]:
+        for il, gr in enumerate(key):
+            prefix = key[:il + 1]
+            if prefix in self.__groups:
+                grp = self.__groups[prefix]
+                continue
             gn = gr
             gt = None
             if ":" in gr:
                 gn, gt = gr.split(":")
 
-            if grp.has_group(gn):
+            h5path = node_path(prefix)
+            exists = self.node_exists(h5path)
+            if exists is None:
+                exists = grp.has_group(gn)
+            if exists:
                 grp = grp.get_group(gn)
             else:
                 grp = h5cpp.node.Group(grp, gn)
@@ -794,13 +2048,34 @@ class NXSFile:
                     grp.attributes.create(
                         "NX_class",
                         h5cpp.datatype.kVariableString).write(gt)
-            # print(gn)
+                if self.__nodes is not None:
+                    self.__nodes[h5path] = "group"
+            self.__groups[prefix] = grp
+        return grp
+
+    def create_groupvds(self, root, lnxpath, dtype, shape, vmaps):
+        """ create field
+
+        :param root: root object
+        :type root: :class:`nxgroup`
+        :param lnxpath: nexus path list
+        :type lnxpath: :obj:`list` <:obj:`str`>
+        :param dtype: nexus field type
+        :type dtype: :obj:`str`
+        :param shape: shape
+        :type shape: :obj:`list` < :obj:`int` >
+        :returns: nexus field
+        :rtype: :class:`pninexus.h5cpp.node.Dataset`
+        """
+        grp = self.get_group(root, lnxpath[:-1])
         name = lnxpath[-1]
         # print("CREATE VDS", name, dtype, shape, vmaps)
         dataset = self.create_vds(grp, name, dtype, shape, vmaps)
+        if self.__nodes is not None:
+            self.__nodes[node_path(lnxpath)] = "field"
         return dataset
 
-    def write_attr(self, am, name, dtype, value, item=None):
+    def write_attr(self, am, name, dtype, value, item=None, names=None):
         """ write attribute
 
         :param am: attribute manager
@@ -813,13 +2088,20 @@ class NXSFile:
         :type name: :any:
         :param item: element description
         :type item: :obj:`dict`
+        :param names: index of attribute names of the node,
+                      updated with created attributes
+        :type names: :obj:`set` <:obj:`str`>
         """
         at = None
         try:
-            if name in [att.name for att in am]:
+            if names is not None:
+                if name in names:
+                    at = am[name]
+            elif am.exists(name):
                 at = am[name]
         except Exception:
             pass
+        created = False
         if at is None:
             try:
                 vshape = None
@@ -831,6 +2113,9 @@ class NXSFile:
                     at = am.create(name, PTH[str(dtype)])
                 else:
                     at = am.create(name, PTH[str(dtype)], vshape)
+                created = True
+                if names is not None:
+                    names.add(name)
             except Exception as e:
                 self._streams.error(
                     "NXSFile::write_attr() - %s %s %s %s"
@@ -838,6 +2123,9 @@ class NXSFile:
         try:
             if at is not None:
                 try:
+                    if created:
+                        at.write(value)
+                        return
                     rvalue = None
                     try:
                         if at.dataspace.type == h5cpp.dataspace.Type.SCALAR \
@@ -855,7 +2143,7 @@ class NXSFile:
                         rvalue = first(rvalue)
                     else:
                         ashape = at.dataspace.current_dimensions
-                    if str(rvalue) != str(value):
+                    if not equal_values(rvalue, value):
                         if ashape != vshape:
                             am.remove(name)
                             at = am.create(name, PTH[str(dtype)], vshape)
@@ -893,64 +2181,80 @@ class NXSFile:
         :param root: nexus root group
         :type root: :class:`pninexus.h5cpp.node.Group`
         :param item: element description
-        :type item: :obj:`dict`
+        :type item: :obj:`dict` or :class:`SnapshotItem`
         :param default_nexus_path: default nexus path
         :type default_nexus_path: :obj:`str`
         """
-        nxpath = item.get('nexus_path', default_nexus_path)
-        value = item.get('value', None)
-        dtype = item.get('dtype', None)
-        if dtype == "string":
-            dtype = "str"
+        if not isinstance(item, SnapshotItem):
+            item = SnapshotItem(None, item, default_nexus_path)
+        lnxpath = item.lnxpath
+        h5path = item.h5path
+        attr = item.attr
+        value = item.value
+        dtype = item.dtype
         dataset = None
-        if nxpath and value is not None:
-            attr = None
-            if "@" in nxpath:
-                nxpath, attr = nxpath.split("@", 1)
-            lnxpath = nxpath.split("/")
-            h5path = "/".join([nd.split(":")[0] for nd in lnxpath])
-            try:
-                if not attr:
-                    dataset = root.get_dataset(h5path)
-                    if dataset.dataspace.type != \
-                            h5cpp.dataspace.Type.SCALAR:
-                        if not dataset.dataspace.size:
+        created = False
+        if lnxpath and value is not None:
+            missing = self.node_exists(h5path) is False
+            if not missing:
+                try:
+                    if not attr:
+                        dataset = root.get_dataset(h5path)
+                        if dataset.dataspace.type != \
+                                h5cpp.dataspace.Type.SCALAR:
+                            if not dataset.dataspace.size:
+                                try:
+                                    dataset.extent(0, 1)
+                                except Exception:
+                                    pass
+                        dataset.write(value)
+                    else:
+                        if ":" not in lnxpath:
                             try:
-                                dataset.extent(0, 1)
+                                adataset = root.get_dataset(h5path)
+                                am = adataset.attributes
                             except Exception:
-                                pass
-                    dataset.write(value)
-                else:
-                    if ":" not in lnxpath:
-                        try:
-                            adataset = root.get_dataset(h5path)
-                            am = adataset.attributes
-                        except Exception:
+                                group = root.get_group(h5path)
+                                am = group.attributes
+                        else:
                             group = root.get_group(h5path)
                             am = group.attributes
+                        self.write_attr(am, attr, dtype, value)
+                except Exception as e:
+                    # print(nxpath, str(e))
+                    if str(e).startswith("No node ["):
+                        missing = True
                     else:
-                        group = root.get_group(h5path)
-                        am = group.attributes
-                    self.write_attr(am, attr, dtype, value)
-            except Exception as e:
-                # print(nxpath, str(e))
-                if str(e).startswith("No node ["):
-                    dataset = self.create_groupfield(
-                        root, lnxpath, dtype, value)
-                else:
-                    self._streams.error(
-                        "NXSFile::write_snapshot_item() - %s %s %s %s"
-                        % (am, dtype, PTH[str(dtype)], str(e)))
-                    raise
-        self.add_attributes(dataset, item)
+                        self._streams.error(
+                            "NXSFile::write_snapshot_item() - %s %s %s %s"
+                            % (am, dtype, PTH[str(dtype)], str(e)))
+                        raise
+            if missing:
+                dataset = self.create_groupfield(
+                    root, lnxpath, dtype, value,
+                    compression=self.__compression
+                    if item.compression is None else item.compression)
+                created = True
+        self.add_attributes(dataset, item.attrs, created)
 
     def close(self):
         """ close file
         """
+        self.trim_fields()
+        self.__swmr_mode = False
+        self.__groups = {}
+        self.__nodes = None
+        self.__spaces = {}
+        # hdf5 keeps the file open while any of its objects is referenced
+        for item in self.__plan:
+            for target in item.fields:
+                target.field = None
+            item.fields = []
+        self.__plan = []
+        self.__nxfields = {}
+        self.__cursors = {}
+        self.__cursor_group = None
         root = self.__mfile.root()
         root.close()
         self.__mfile.close()
         self.__mfile = None
-        self.__cursors = {}
-        self.__nxfields = {}
-        self.__lbnames = {}
@@ -22,22 +22,38 @@
 import weakref
 import time
 import threading
+import queue
+import collections
+import multiprocessing
+import concurrent.futures.process
+
+import numpy as np
 
 from blissdata.redis_engine.store import DataStore
 from blissdata.redis_engine.scan import ScanState
 from blissdata.redis_engine.exceptions import EndOfStream
 from blissdata.redis_engine.exceptions import NoScanAvailable
 
-from .NXSFile import create_nexus_file
+from .NXSFile import NXSFile, create_nexus_file
 from .StreamSet import StreamSet
 
 
+#: (:obj:`float`) maximal wait time for new scans
+#:    if pending scans wait for a free scan writer
+PENDING_WAIT_TIME = 0.5
+
+#: (:obj:`float`) maximal wait time for messages of scan writer processes
+PROCESS_POLL_TIME = 0.1
+
+
 class NXSWriterService:
 
     def __init__(self, redis_url, session, next_scan_timeout,
                  default_nexus_path="/scan{serialno}:NXentry/"
                  "instrument:NXinstrument/collection",
-                 point_sleep_time=0.01, server=None):
+                 point_sleep_time=0.01, server=None, file_options=None,
+                 event_wait_time=0, queue_depth=0, prefetch=False,
+                 max_writers=0, processes=False):
         """ constructor
 
         :param redis_url: blissdata redis url
@@ -52,6 +68,23 @@ class NXSWriterService:
         :type point_sleep_time: :obj:`float`
         :param server: NXSConfigServer instance
         :type server: :class:`tango.LatestDeviceImpl`
+        :param file_options: extra NXSFile keyword options
+        :type file_options: :obj:`dict` <:obj:`str`, `any`>
+        :param event_wait_time: maximal wait time for scan events
+               in seconds, if 0 the scan is polled every point_sleep_time
+        :type event_wait_time: :obj:`float`
+        :param queue_depth: maximal number of read blocks waiting for
+               writing in the reader-writer pipeline, if 0 the scan points
+               are read and written in one thread
+        :type queue_depth: :obj:`int`
+        :param prefetch: build the file structure of new scans
+               in their scan writers before they are prepared
+        :type prefetch: :obj:`bool`
+        :param max_writers: maximal number of concurrent scan writers,
+               if 0 unlimited
+        :type max_writers: :obj:`int`
+        :param processes: write scans in a pool of worker processes
+        :type processes: :obj:`bool`
         """
         #: (:class:`StreamSet` or :class:`tango.LatestDeviceImpl`) stream set
         self._streams = StreamSet(weakref.ref(server) if server else None)
@@ -67,14 +100,35 @@ class NXSWriterService:
         self.__session = session
         #: (:obj:`float`) sleep time between write point calls
         self.__point_sleep_time = point_sleep_time
+        #: (:obj:`dict` <:obj:`str`, `any`>) extra NXSFile keyword options
+        self.__file_options = dict(file_options or {})
+        #: (:obj:`float`) maximal wait time for scan events
+        self.__event_wait_time = event_wait_time
+        #: (:obj:`int`) queue depth of the reader-writer pipeline
+        self.__queue_depth = queue_depth
+        #: (:obj:`bool`) build file structures before scans are prepared
+        self.__prefetch = prefetch
+        #: (:obj:`bool`) write scans in a pool of worker processes
+        self.__processes = processes
+        #: (:obj:`str`) blissdata redis url
+        self.__redis_url = redis_url
         #: (:class:`blissdata.redis_engine.store.DataStore`) datastore
         self.__datastore = DataStore(redis_url)
         #: (:obj:`list`<:obj:`str`>) error list
         self.__errors = []
         #: (:class:`threading.Lock`) threading lock
         self.__error_lock = threading.Lock()
-        #: (:obj:`dict`<:obj:`str`, :class:`ScanWriter`>) scan writers
+        #: (:obj:`int`) maximal number of concurrent scan writers
+        self.__max_writers = max_writers
+        #: (:obj:`dict`<:obj:`str`, :class:`ScanWriter`>) running scan writers
         self.__sws = {}
+        #: (:class:`collections.deque` <(:obj:`str`, :class:`ScanWriter`)>)
+        #:     scan writers waiting for start
+        self.__pending = collections.deque()
+        #: (:class:`threading.Lock`) scan writer registry lock
+        self.__sws_lock = threading.Lock()
+        #: (:class:`WriterProcessPool`) pool of scan writer processes
+        self.__pool = None
 
     def start(self):
         """ start writer service
@@ -86,43 +140,94 @@ class NXSWriterService:
 
         while self.__running:
             try:
+                self.join_scans()
+                self.start_scans()
+                timeout = self.__next_scan_timeout
+                if self.__pending:
+                    # pending scans start as soon as scan writers finish
+                    timeout = min(timeout, PENDING_WAIT_TIME) \
+                        if timeout else PENDING_WAIT_TIME
                 try:
                     timestamp, key = self.__datastore.get_next_scan(
-                        since=timestamp, timeout=self.__next_scan_timeout
+                        since=timestamp, timeout=timeout
                     )
                 except NoScanAvailable:
                     continue
                 scan = self.__datastore.load_scan(key)
                 if self.__session in ["__all__", scan.session]:
-                    self.join_scans()
-                    sw = ScanWriter(
-                        scan, self._streams,
+                    options = (
                         self.__next_scan_timeout,
                         self.__default_nexus_path,
-                        self.__point_sleep_time)
-                    self.__sws[key] = sw
-                    sw.start()
+                        self.__point_sleep_time,
+                        self.__file_options,
+                        self.__event_wait_time,
+                        self.__queue_depth,
+                        self.__prefetch)
+                    if self.__processes:
+                        sw = ScanProcess(
+                            self.__redis_url, key, self._streams, options,
+                            self.process_pool())
+                    else:
+                        sw = ScanWriter(scan, self._streams, *options)
+                    with self.__sws_lock:
+                        self.__pending.append((key, sw))
+                    self.start_scans()
                     #  self.write_scan(scan)
             except Exception as e:
                 self.__error = True
                 with self.__error_lock:
                     self.__errors.append(str(e))
 
+    def process_pool(self):
+        """ pool of scan writer processes reused by subsequent scans,
+        created at the first scan
+
+        :returns: pool of scan writer processes
+        :rtype: :class:`WriterProcessPool`
+        """
+        with self.__sws_lock:
+            if self.__pool is None:
+                self.__pool = WriterProcessPool(self.__max_writers)
+            return self.__pool
+
+    def start_scans(self):
+        """ start pending scan writers up to the maximal number
+        of concurrent scan writers
+        """
+        with self.__sws_lock:
+            while self.__pending and self.__running and (
+                    self.__max_writers <= 0
+                    or len(self.__sws) < self.__max_writers):
+                key, sw = self.__pending.popleft()
+                self.__sws[key] = sw
+                sw.start()
+
     def join_scans(self, stop=False):
-        """ join scans  which are stopped
+        """ join scan writers which are finished without waiting
+        for the running ones
 
         :param stop: stop all scans flag
         :type stop: :obj:`bool`
         """
-        for key in list(self.__sws.keys()):
-            sw = self.__sws.pop(key)
+        with self.__sws_lock:
             if stop:
-                sw.running = False
-            if not sw.running:
-                if sw.error:
-                    with self.__error_lock:
-                        self.__errors.extend(sw.errors[:])
-                sw.join()
+                if self.__pending:
+                    self._streams.warn(
+                        "NXSWriterService::join_scans() - "
+                        "%s pending scans are not written"
+                        % len(self.__pending))
+                self.__pending.clear()
+            for key in list(self.__sws.keys()):
+                sw = self.__sws[key]
+                if stop:
+                    sw.running = False
+                    sw.join()
+                if not sw.is_alive():
+                    self.__sws.pop(key)
+                    if sw.error:
+                        with self.__error_lock:
+                            self.__errors.extend(sw.errors[:])
+                    sw.join()
 
     def get_status(self):
         """ get writer service status
@@ -137,7 +242,11 @@ class NXSWriterService:
         """ stop writer service
         """
         self.__running = False
-        self.joint_scans(stop=True)
+        self.join_scans(stop=True)
+        with self.__sws_lock:
+            pool, self.__pool = self.__pool, None
+        if pool is not None:
+            pool.shutdown()
 
     def errors(self):
         """ list of errors
@@ -153,7 +262,8 @@ class ScanWriter(threading.Thread):
     def __init__(self, scan, streams, next_scan_timeout,
                  default_nexus_path="/scan{serialno}:NXentry/"
                  "instrument:NXinstrument/collection",
-                 point_sleep_time=0.01):
+                 point_sleep_time=0.01, file_options=None,
+                 event_wait_time=0, queue_depth=0, prefetch=False):
         """ constructor
 
         :param scan: blissdata redis url
@@ -166,6 +276,18 @@ class ScanWriter(threading.Thread):
         :type default_nexus_path: :obj:`str`
         :param point_sleep_time: sleep time between write point calls
         :type point_sleep_time: :obj:`float`
+        :param file_options: extra NXSFile keyword options
+        :type file_options: :obj:`dict` <:obj:`str`, `any`>
+        :param event_wait_time: maximal wait time for scan events
+               in seconds, if 0 the scan is polled every point_sleep_time
+        :type event_wait_time: :obj:`float`
+        :param queue_depth: maximal number of read blocks waiting for
+               writing in the reader-writer pipeline, if 0 the scan points
+               are read and written in one thread
+        :type queue_depth: :obj:`int`
+        :param prefetch: build the file structure of the scan
+               while it is being prepared
+        :type prefetch: :obj:`bool`
         """
         threading.Thread.__init__(self)
         #: (:class:`Scan`) blissdata scan
@@ -182,6 +304,14 @@ class ScanWriter(threading.Thread):
         self.__default_nexus_path = default_nexus_path
         #: (:obj:`float`) sleep time between write point calls
         self.__point_sleep_time = point_sleep_time
+        #: (:obj:`dict` <:obj:`str`, `any`>) extra NXSFile keyword options
+        self.__file_options = file_options or {}
+        #: (:obj:`float`) maximal wait time for scan events
+        self.__event_wait_time = event_wait_time
+        #: (:obj:`int`) queue depth of the reader-writer pipeline
+        self.__queue_depth = queue_depth
+        #: (:obj:`bool`) build the file structure before PREPARED
+        self.__prefetch = prefetch
         #: (:obj:`list`<:obj:`str`>) error list
         self.errors = []
         #: (:class:`threading.Lock`) threading lock
@@ -192,10 +322,11 @@ class ScanWriter(threading.Thread):
 
         """
         self.running = True
+        nxsfl = None
         try:
-            while self._scan.state < ScanState.PREPARED and self.running:
-                time.sleep(self.__point_sleep_time)
-                self._scan.update()
+            if self.__prefetch:
+                self.prefetch_structure()
+            self.wait_for_state(ScanState.PREPARED)
             self._streams.info(
                 "NXSWriterService::write_scan CREATE FILE: %s"
                 % self._scan.number)
@@ -203,7 +334,8 @@ class ScanWriter(threading.Thread):
             nxsfl = create_nexus_file(
                 self._scan,
                 self._streams,
-                self.__default_nexus_path)
+                self.__default_nexus_path,
+                self.__file_options)
             if nxsfl is None:
                 return
 
@@ -212,21 +344,13 @@ class ScanWriter(threading.Thread):
             nxsfl.write_init_snapshot()
 
             nxsfl.prepareChannels()
+            nxsfl.start_swmr()
 
-            # while scan.state < ScanState.STOPPED:
-            while self.running:
-                try:
-                    self._scan.update(block=False)
-                    self._streams.debug(
-                        "NXSWriterService::write_scan SCAN POINT: %s"
-                        % self._scan.number)
-                    nxsfl.write_scan_points()
-                    time.sleep(self.__point_sleep_time)
-                except EndOfStream:
-                    break
-            while self._scan.state < ScanState.CLOSED and self.running:
-                time.sleep(self.__point_sleep_time)
-                self._scan.update()
+            if self.__queue_depth > 0:
+                self.write_pipeline(nxsfl)
+            else:
+                self.write_loop(nxsfl)
+            self.wait_for_state(ScanState.CLOSED)
 
             self._streams.debug(
                 "NXSWriterService::update VDS: %s" % self._scan.number)
@@ -240,9 +364,426 @@ class ScanWriter(threading.Thread):
                 self.errors.append(str(e))
             self._streams.error("NXSWriterService::error %s" % str(e))
         finally:
-            nxsfl.close()
+            if nxsfl is not None:
+                nxsfl.close()
         self.running = False
 
+    def prefetch_structure(self):
+        """ build the cached file structure of the scan and its skeleton
+        file in the process writing the scan, before it is prepared
+        """
+        try:
+            if NXSFile(self._scan, None, self._streams,
+                       **self.__file_options).prefetch_structure():
+                self._streams.info(
+                    "NXSWriterService::prefetch_structure() - %s"
+                    % self._scan.number)
+        except Exception as e:
+            self._streams.warn(
+                "NXSWriterService::prefetch_structure() - %s" % str(e))
+
+    def write_loop(self, nxsfl):
+        """ read and write scan points in the scan writer thread
+
+        :param nxsfl: nexus file
+        :type nxsfl: :class:`NXSFile`
+        """
+        # while scan.state < ScanState.STOPPED:
+        while self.running:
+            try:
+                self._scan.update(block=False)
+                self._streams.debug(
+                    "NXSWriterService::write_scan SCAN POINT: %s"
+                    % self._scan.number)
+                if self.__event_wait_time > 0:
+                    nxsfl.write_scan_points(self.__event_wait_time)
+                    time.sleep(nxsfl.write_delay())
+                else:
+                    nxsfl.write_scan_points()
+                    time.sleep(self.__point_sleep_time)
+            except EndOfStream:
+                break
+
+    def write_pipeline(self, nxsfl):
+        """ write scan points read by a separate reader thread
+
+        :param nxsfl: nexus file
+        :type nxsfl: :class:`NXSFile`
+        """
+        points = queue.Queue(self.__queue_depth)
+        reader = PointReader(
+            self._scan, nxsfl, points, self._streams,
+            self.__point_sleep_time, self.__event_wait_time)
+        reader.start()
+        wait = self.__event_wait_time or self.__point_sleep_time
+        pending = {}
+        last = None
+        try:
+            while self.running:
+                # the scan is updated only in the scan writer thread
+                self._scan.update(block=False)
+                try:
+                    block = points.get(
+                        timeout=nxsfl.write_delay() if pending else wait)
+                except queue.Empty:
+                    block = []
+                if isinstance(block, Exception):
+                    last = block
+                    break
+                for item, values in block:
+                    pending.setdefault(item, []).append(values)
+                if pending and nxsfl.write_delay() <= 0:
+                    nxsfl.write_points(self.merge_points(pending))
+                    pending = {}
+        finally:
+            reader.stop.set()
+            if pending:
+                nxsfl.write_points(self.merge_points(pending))
+            # stream reads are finite so the reader always finishes
+            reader.join()
+        if last is not None and not isinstance(last, EndOfStream):
+            raise last
+
+    @staticmethod
+    def merge_points(pending):
+        """ merge data blocks of the write plan items
+
+        :param pending: data blocks of the write plan items
+        :type pending: :obj:`dict` <:class:`WritePlanItem`,
+                       :obj:`list` <:class:`numpy.ndarray`>>
+        :returns: write plan items with their merged data
+        :rtype: :obj:`list` <(:class:`WritePlanItem`,
+                :class:`numpy.ndarray`)>
+        """
+        return [(item, blocks[0] if len(blocks) == 1
+                 else np.concatenate(blocks))
+                for item, blocks in pending.items()]
+
+    def wait_for_state(self, state):
+        """ wait until the scan reaches the given state
+
+        :param state: scan state
+        :type state: :class:`ScanState`
+        """
+        while self._scan.state < state and self.running:
+            if self.__event_wait_time > 0:
+                self._scan.update(timeout=self.__event_wait_time)
+            else:
+                time.sleep(self.__point_sleep_time)
+                self._scan.update()
+
+
+class QueueStreams:
+
+    def __init__(self, messages):
+        """ constructor
+
+        :param messages: queue of log messages with their levels
+        :type messages: :class:`queue.Queue`
+        """
+        #: (:class:`queue.Queue`) queue of log messages
+        self.__messages = messages
+
+    def fatal(self, message, std=None):
+        """ sends fatal error message
+
+        :param message: error message
+        :type message: :obj:`str`
+        :param std: not used
+        :type std: :obj:`bool`
+        """
+        self.__messages.put(("fatal", message))
+
+    def error(self, message, std=None):
+        """ sends error message
+
+        :param message: error message
+        :type message: :obj:`str`
+        :param std: not used
+        :type std: :obj:`bool`
+        """
+        self.__messages.put(("error", message))
+
+    def warn(self, message, std=None):
+        """ sends warning message
+
+        :param message: warning message
+        :type message: :obj:`str`
+        :param std: not used
+        :type std: :obj:`bool`
+        """
+        self.__messages.put(("warn", message))
+
+    def info(self, message, std=None):
+        """ sends info message
+
+        :param message: info message
+        :type message: :obj:`str`
+        :param std: not used
+        :type std: :obj:`bool`
+        """
+        self.__messages.put(("info", message))
+
+    def debug(self, message, std=None):
+        """ sends debug message
+
+        :param message: debug message
+        :type message: :obj:`str`
+        :param std: not used
+        :type std: :obj:`bool`
+        """
+        self.__messages.put(("debug", message))
+
+
+def write_scan(redis_url, key, messages, stop, options):
+    """ write scan in a worker process
+
+    :param redis_url: blissdata redis url
+    :type redis_url: :obj:`str`
+    :param key: scan key
+    :type key: :obj:`str`
+    :param messages: queue of log messages with their levels
+    :type messages: :class:`queue.Queue`
+    :param stop: stop event of the scan writer
+    :type stop: :class:`threading.Event`
+    :param options: ScanWriter parameters following its stream set
+    :type options: :obj:`tuple`
+    """
+    streams = QueueStreams(messages)
+    errors = []
+    try:
+        scan = DataStore(redis_url).load_scan(key)
+        sw = ScanWriter(scan, streams, *options)
+        sw.start()
+        while sw.is_alive():
+            if stop.is_set():
+                sw.running = False
+            sw.join(PROCESS_POLL_TIME)
+        errors = sw.errors[:]
+    except Exception as e:
+        errors.append(str(e))
+        streams.error("NXSWriterService::error %s" % str(e))
+    messages.put(("errors", errors))
+
+
+class WriterProcessPool:
+
+    def __init__(self, max_workers=0):
+        """ constructor
+
+        :param max_workers: number of worker processes,
+               if 0 the number of processors
+        :type max_workers: :obj:`int`
+        """
+        # a fresh interpreter does not inherit threads and hdf5 state
+        #: (:class:`multiprocessing.context.SpawnContext`) process context
+        self.__context = multiprocessing.get_context("spawn")
+        #: (:obj:`int`) number of worker processes
+        self.__max_workers = max_workers if max_workers > 0 else None
+        #: (:class:`multiprocessing.managers.SyncManager`) manager of
+        #:    message queues and stop events passed to the workers
+        self.__manager = self.__context.Manager()
+        #: (:class:`threading.Lock`) worker pool lock
+        self.__lock = threading.Lock()
+        #: (:class:`concurrent.futures.ProcessPoolExecutor`) worker pool
+        #:    keeping interpreters and their caches between scans
+        self.__executor = self.executor()
+
+    def executor(self):
+        """ create a pool of worker processes
+
+        :returns: worker pool
+        :rtype: :class:`concurrent.futures.ProcessPoolExecutor`
+        """
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.__max_workers, mp_context=self.__context)
+
+    def submit(self, redis_url, key, options):
+        """ submit a scan to a worker process
+
+        :param redis_url: blissdata redis url
+        :type redis_url: :obj:`str`
+        :param key: scan key
+        :type key: :obj:`str`
+        :param options: ScanWriter parameters following its stream set
+        :type options: :obj:`tuple`
+        :returns: scan future, queue of log messages and stop event
+        :rtype: :obj:`tuple` <:class:`concurrent.futures.Future`,
+                :class:`queue.Queue`, :class:`threading.Event`>
+        """
+        messages = self.__manager.Queue()
+        stop = self.__manager.Event()
+        with self.__lock:
+            try:
+                future = self.__executor.submit(
+                    write_scan, redis_url, key, messages, stop, options)
+            except concurrent.futures.process.BrokenProcessPool:
+                # a crashed worker breaks the whole pool
+                # so the scan goes to a new one
+                self.__executor.shutdown(wait=False, cancel_futures=True)
+                self.__executor = self.executor()
+                future = self.__executor.submit(
+                    write_scan, redis_url, key, messages, stop, options)
+        return future, messages, stop
+
+    def shutdown(self):
+        """ stop worker processes
+        """
+        with self.__lock:
+            self.__executor.shutdown(wait=True, cancel_futures=True)
+        self.__manager.shutdown()
+
+
+class ScanProcess(threading.Thread):
+
+    def __init__(self, redis_url, key, streams, options, pool):
+        """ constructor
+
+        :param redis_url: blissdata redis url
+        :type redis_url: :obj:`str`
+        :param key: scan key
+        :type key: :obj:`str`
+        :param streams: tango streams
+        :type streams: :class:`StreamSet` or :class:`tango.LatestDeviceImpl`
+        :param options: ScanWriter parameters following its stream set
+        :type options: :obj:`tuple`
+        :param pool: pool of scan writer processes
+        :type pool: :class:`WriterProcessPool`
+        """
+        threading.Thread.__init__(self)
+        #: (:class:`StreamSet` or :class:`tango.LatestDeviceImpl`) stream set
+        self._streams = streams
+        #: (:obj:`bool`) service running flag
+        self.running = True
+        #: (:obj:`bool`) service error flag
+        self.error = False
+        #: (:obj:`list`<:obj:`str`>) error list
+        self.errors = []
+        #: (:class:`threading.Lock`) threading lock
+        self.error_lock = threading.Lock()
+        #: (:obj:`str`) blissdata redis url
+        self.__redis_url = redis_url
+        #: (:obj:`str`) scan key
+        self.__key = key
+        #: (:obj:`tuple`) ScanWriter parameters following its stream set
+        self.__options = options
+        #: (:class:`WriterProcessPool`) pool of scan writer processes
+        self.__pool = pool
+
+    def run(self):
+        """ run scan writer in a worker process and pass its messages
+        to the stream set
+
+        """
+        self.running = True
+        try:
+            future, messages, stop = self.__pool.submit(
+                self.__redis_url, self.__key, self.__options)
+            while True:
+                if not self.running:
+                    stop.set()
+                    future.cancel()
+                try:
+                    level, message = messages.get(
+                        timeout=PROCESS_POLL_TIME)
+                except queue.Empty:
+                    if not future.done():
+                        continue
+                    break
+                if level == "errors":
+                    if message:
+                        self.error = True
+                        with self.error_lock:
+                            self.errors.extend(message)
+                else:
+                    getattr(self._streams, level)(message)
+            if not future.cancelled():
+                try:
+                    future.result()
+                except concurrent.futures.process.BrokenProcessPool:
+                    # the next scan is submitted to a new pool
+                    raise RuntimeError(
+                        "scan writer process %s terminated abruptly"
+                        % self.__key)
+        except Exception as e:
+            self.error = True
+            with self.error_lock:
+                self.errors.append(str(e))
+            self._streams.error("NXSWriterService::error %s" % str(e))
+        self.running = False
+
+
+class PointReader(threading.Thread):
+
+    def __init__(self, scan, nxsfl, points, streams,
+                 point_sleep_time=0.01, event_wait_time=0):
+        """ constructor
+
+        :param scan: blissdata scan
+        :type scan: :class:`Scan`
+        :param nxsfl: nexus file
+        :type nxsfl: :class:`NXSFile`
+        :param points: bounded queue of read data blocks
+        :type points: :class:`queue.Queue`
+        :param streams: tango streams
+        :type streams: :class:`StreamSet` or :class:`tango.LatestDeviceImpl`
+        :param point_sleep_time: sleep time between read point calls
+        :type point_sleep_time: :obj:`float`
+        :param event_wait_time: maximal wait time for stream data
+               in seconds, if 0 the streams are polled every point_sleep_time
+        :type event_wait_time: :obj:`float`
+        """
+        threading.Thread.__init__(self, daemon=True)
+        #: (:class:`Scan`) blissdata scan
+        self._scan = scan
+        #: (:class:`NXSFile`) nexus file
+        self._nxsfl = nxsfl
+        #: (:class:`queue.Queue`) bounded queue of read data blocks
+        self._points = points
+        #: (:class:`StreamSet` or :class:`tango.LatestDeviceImpl`) stream set
+        self._streams = streams
+        #: (:class:`threading.Event`) reader stop event
+        self.stop = threading.Event()
+        #: (:obj:`float`) sleep time between read point calls
+        self.__point_sleep_time = point_sleep_time
+        #: (:obj:`float`) maximal wait time for stream data
+        self.__event_wait_time = event_wait_time
+
+    def run(self):
+        """ read scan data
+
+        """
+        try:
+            while not self.stop.is_set():
+                if self.__event_wait_time > 0:
+                    block = self._nxsfl.read_scan_points(
+                        self.__event_wait_time)
+                else:
+                    block = self._nxsfl.read_scan_points()
+                    self.stop.wait(self.__point_sleep_time)
+                if block:
+                    self.put(block)
+        except Exception as e:
+            self.put(e)
+
+    def put(self, block):
+        """ put a data block into the queue,
+        it blocks while the queue is full
+
+        :param block: data block or the final exception
+        :type block: :obj:`list` or :class:`Exception`
+        """
+        while not self.stop.is_set():
+            try:
+                self._points.put(
+                    block,
+                    timeout=self.__event_wait_time or self.__point_sleep_time)
+                return
+            except queue.Full:
+                self._streams.debug(
+                    "PointReader::put() - queue is full: %s"
+                    % self._scan.number)
+
 
 def main():
     """ main function
@@ -0,0 +1,272 @@
+""" tests of referenced data handlers """
+
+import pathlib
+
+import numpy as np
+from pninexus import h5cpp
+
+from blissdata.redis_engine.exceptions import EndOfStream
+from nxsblisswriter.DataHandlers import (
+    HANDLERS, LimaHandler, SingleFileHandler, data_handler, file_pattern,
+    file_vmaps, frame_layout, has_plugin, register_single_file_formats)
+from nxsblisswriter.NXSFile import NXSFile
+
+
+class Streams:
+
+    """ silent log streams """
+
+    def __getattr__(self, name):
+        return lambda msg: None
+
+
+class Cursor:
+
+    """ cursor of a stream without points """
+
+    def read(self, block=True, timeout=0):
+        raise EndOfStream()
+
+
+class Stream:
+
+    """ referenced data stream """
+
+    def __init__(self, plugin, info, shape, length):
+        self.plugin = plugin
+        self.info = info
+        self.shape = shape
+        self.dtype = "int32"
+        self.length = length
+
+    def cursor(self):
+        return Cursor()
+
+    def __len__(self):
+        return self.length
+
+
+class Scan:
+
+    """ scan with referenced data streams """
+
+    def __init__(self, streams, datadesc):
+        self.streams = streams
+        self.info = {"snapshot": {}, "datadesc": datadesc}
+
+
+def create_sources(tmp_path, number, frames, frame_shape):
+    """ create detector files with the frame index as their data """
+    for fid in range(number):
+        fl = h5cpp.file.create(
+            str(tmp_path / ("img_%d.h5" % fid)),
+            h5cpp.file.AccessFlags.TRUNCATE)
+        grp = h5cpp.node.Group(fl.root(), "entry")
+        data = np.zeros([frames] + frame_shape, dtype="int32")
+        for i in range(frames):
+            data[i] = fid * frames + i
+        ds = h5cpp.node.Dataset(
+            grp, h5cpp.Path("data"), h5cpp.datatype.kInt32,
+            h5cpp.dataspace.Simple(data.shape))
+        ds.write(data)
+        fl.close()
+
+
+def read_vds(tmp_path, shape, vmaps):
+    """ create a vds with the virtual maps and read it back """
+    fpath = pathlib.Path(tmp_path / "scan.nxs")
+    nxsfl = NXSFile(None, fpath, Streams())
+    fl = h5cpp.file.create(str(fpath), h5cpp.file.AccessFlags.TRUNCATE)
+    nxsfl.create_vds(fl.root(), "data", "int32", shape, vmaps)
+    fl.close()
+    fl = h5cpp.file.open(str(fpath), h5cpp.file.AccessFlags.READONLY)
+    ds = fl.root().get_dataset("data")
+    dims = list(ds.dataspace.current_dimensions)
+    data = ds.read()
+    fl.close()
+    return dims, data
+
+
+def test_frame_layout():
+    assert frame_layout(9, 9, 3).tolist() == [3, 3, 3]
+    assert frame_layout(8, 4, 3).tolist() == [3, 1, 3, 1]
+    assert frame_layout(5, 9, 2).tolist() == [2, 2, 1]
+    assert frame_layout(0, 9, 3).tolist() == []
+
+
+def test_file_pattern():
+    assert file_pattern(
+        "/data/scan/scan.nxs", "img", "/data/scan/img/img_%d.h5") \
+        == "img/img_%d.h5"
+    assert file_pattern(
+        "/data/scan/scan.nxs", "img", "/other/img_%d.h5") \
+        == "/data/scan/scan/img/img_%d.h5"
+
+
+def test_lima_handler():
+    handler = data_handler("lima", "lima_v1")
+    assert isinstance(handler, LimaHandler)
+    assert has_plugin("lima")
+    info = {"lima_info": {
+        "frame_per_acquisition": 9, "file_offset": 0,
+        "file_format": "hdf5", "file_path": "/data/img/img_%d.h5",
+        "data_path": "/entry/data", "frame_per_file": 3}}
+    vmaps = handler.vmaps("img", info, [7, 2], "/data/scan.nxs")
+    assert vmaps[0]["class"] == "VirtualDataBlocks"
+    assert vmaps[0]["filename"] == "img/img_%d.h5"
+    assert vmaps[0]["frames"].tolist() == [3, 3, 1]
+    vmaps = handler.live_vmaps("img", info, [2], "/data/scan.nxs")
+    assert vmaps[0]["class"] == "VirtualDataMap"
+    assert vmaps[0]["filename"] == "img/img_%b.h5"
+
+
+def test_file_vmaps_unsupported():
+    assert file_vmaps([9, 2], 9, 0, "edf", "img_%d.edf", "/d", 3) == []
+    assert file_vmaps([9, 2], 9, 0, "hdf5", "img_%d.h5", "", 3) == []
+    assert file_vmaps([9, 2], 0, 0, "hdf5", "img_%d.h5", "/d", 3) == []
+
+
+def test_file_vmaps_live():
+    vmaps = file_vmaps(
+        [9, 2], 9, 0, "hdf5", "img_%d.h5", "/d", 3, live=True)
+    assert len(vmaps) == 1
+    assert vmaps[0]["class"] == "VirtualDataMap"
+    assert vmaps[0]["filename"] == "img_%b.h5"
+    # partial files and file offsets are not mapped live
+    assert file_vmaps(
+        [8, 2], 8, 0, "hdf5", "img_%d.h5", "/d", 3, live=True) == []
+    assert file_vmaps(
+        [9, 2], 9, 2, "hdf5", "img_%d.h5", "/d", 3, live=True) == []
+
+
+def test_file_vmaps_final_bounded():
+    vmaps = file_vmaps([9, 2], 9, 0, "hdf5", "img_%d.h5", "/d", 3)
+    assert len(vmaps) == 1
+    assert vmaps[0]["class"] == "VirtualDataBlocks"
+    assert vmaps[0]["frames"].tolist() == [3, 3, 3]
+    assert vmaps[0]["offsets"].tolist() == [0, 3, 6]
+    assert vmaps[0]["file_ids"].tolist() == [0, 1, 2]
+
+
+def test_file_vmaps_final_stray_file(tmp_path):
+    # the fourth file does not belong to the scan
+    create_sources(tmp_path, 4, 3, [2, 2])
+    vmaps = file_vmaps(
+        [9, 2, 2], 9, 0, "hdf5", "img_%d.h5", "/entry/data", 3)
+    dims, data = read_vds(tmp_path, [9, 2, 2], vmaps)
+    assert dims == [9, 2, 2]
+    assert data[:, 0, 0].tolist() == list(range(9))
+
+    # the unlimited mapping would grow with the stray file
+    vmaps = file_vmaps(
+        [9, 2, 2], 9, 0, "hdf5", "img_%d.h5", "/entry/data", 3, live=True)
+    dims, _ = read_vds(tmp_path, [3, 2, 2], vmaps)
+    assert dims == [12, 2, 2]
+
+
+def test_file_vmaps_final_missing_file(tmp_path):
+    create_sources(tmp_path, 2, 3, [2, 2])
+
+    def check(frame_nb, file_ids, file_pattern, data_path):
+        frame_nb = frame_nb.copy()
+        frame_nb[file_ids >= 2] = 0
+        return frame_nb
+
+    vmaps = file_vmaps(
+        [9, 2, 2], 9, 0, "hdf5", "img_%d.h5", "/entry/data", 3, check)
+    assert vmaps[0]["file_ids"].tolist() == [0, 1]
+    dims, data = read_vds(tmp_path, [9, 2, 2], vmaps)
+    assert dims == [9, 2, 2]
+    assert data[:6, 0, 0].tolist() == list(range(6))
+    assert data[6:, 0, 0].tolist() == [0, 0, 0]
+
+
+def test_register_single_file_formats():
+    try:
+        register_single_file_formats(" myplugin : myformat, wrong, :x")
+        assert isinstance(
+            data_handler("myplugin", "myformat"), SingleFileHandler)
+        assert has_plugin("myplugin")
+        assert data_handler("myplugin", "other") is None
+        assert ("", "x") not in HANDLERS
+    finally:
+        HANDLERS.pop(("myplugin", "myformat"), None)
+    assert not has_plugin("myplugin")
+
+
+def test_single_file_vmaps():
+    handler = SingleFileHandler()
+    info = {"file_path": "/tmp/scan/img.h5", "data_path": "/entry/data"}
+    vmaps = handler.vmaps("img", info, [5, 2], "/tmp/scan.nxs")
+    assert len(vmaps) == 1
+    assert vmaps[0]["class"] == "VirtualDataBlocks"
+    assert vmaps[0]["filename"] == "scan/img.h5"
+    assert vmaps[0]["frames"].tolist() == [5]
+    assert vmaps[0]["offsets"].tolist() == [0]
+    assert handler.vmaps("img", {}, [5, 2], "/tmp/scan.nxs") == []
+    assert handler.vmaps("img", info, [0, 2], "/tmp/scan.nxs") == []
+    assert handler.live_vmaps("img", info, [2], "/tmp/scan.nxs") == []
+
+
+def test_single_file_final_vds(tmp_path):
+    create_sources(tmp_path, 1, 5, [2, 2])
+    stream = Stream(
+        "myplugin",
+        {"format": "myformat",
+         "file_path": str(tmp_path / "img_0.h5"),
+         "data_path": "/entry/data"},
+        (2, 2), 5)
+    scan = Scan({"img": stream},
+                {"img": {"label": "img", "unit": "counts"}})
+    fpath = pathlib.Path(tmp_path / "scan.nxs")
+    try:
+        nxsfl = NXSFile(
+            scan, fpath, Streams(), "/scan:NXentry/data:NXdata",
+            single_file_formats="myplugin:myformat")
+        nxsfl.create_file_structure()
+        nxsfl.prepareChannels()
+        nxsfl.write_final_snapshot()
+        nxsfl.close()
+    finally:
+        HANDLERS.pop(("myplugin", "myformat"), None)
+    fl = h5cpp.file.open(str(fpath), h5cpp.file.AccessFlags.READONLY)
+    ds = fl.root().get_dataset("/scan/data/img")
+    assert list(ds.dataspace.current_dimensions) == [5, 2, 2]
+    assert ds.read()[:, 0, 0].tolist() == list(range(5))
+    assert ds.attributes["units"].read() == "counts"
+    fl.close()
+
+
+def test_live_vds(tmp_path):
+    path = tmp_path / "img"
+    path.mkdir()
+    info = {"format": "lima_v1", "lima_info": {
+        "frame_per_acquisition": 9, "file_offset": 0, "frame_per_file": 3,
+        "file_format": "hdf5", "data_path": "/entry/data",
+        "file_path": str(path / "img_%d.h5")}}
+    create_sources(path, 2, 3, [2, 2])
+    scan = Scan({"img": Stream("lima", info, (2, 2), 9)},
+                {"img": {"label": "img"}})
+    nxsfl = NXSFile(scan, pathlib.Path(tmp_path / "scan.nxs"), Streams(),
+                    "/scan:NXentry/instrument:NXinstrument/collection")
+    nxsfl.create_file_structure()
+    nxsfl.write_init_snapshot()
+    nxsfl.prepareChannels()
+    # the vds is created with the channels and grows with the lima files
+    root = nxsfl._NXSFile__mfile.root()
+    ds = root.get_dataset("/scan/instrument/collection/img")
+    assert ds.dataspace.current_dimensions == (6, 2, 2)
+    assert ds.dataspace.maximum_dimensions[0] == h5cpp.dataspace.UNLIMITED
+    # including a stray file of an earlier acquisition
+    create_sources(path, 4, 3, [2, 2])
+    ds = root.get_dataset("/scan/instrument/collection/img")
+    assert ds.dataspace.current_dimensions == (12, 2, 2)
+    ds = root = None
+    nxsfl.write_final_snapshot()
+    nxsfl.close()
+    fl = h5cpp.file.open(
+        str(tmp_path / "scan.nxs"), h5cpp.file.AccessFlags.READONLY)
+    ds = fl.root().get_dataset("/scan/instrument/collection/img")
+    assert ds.dataspace.current_dimensions == (9, 2, 2)
+    assert ds.read()[:, 0, 0].tolist() == list(range(9))
+    fl.close()
@@ -0,0 +1,65 @@
+""" tests of the write interval scheduler """
+
+import pytest
+
+from nxsblisswriter.FlushScheduler import FlushScheduler
+
+
+def test_first_write_is_due():
+    scheduler = FlushScheduler(0.1, 1)
+    assert scheduler.delay(5.) == 0
+    assert scheduler.due(5.)
+
+
+def test_latency_bounds():
+    scheduler = FlushScheduler(2, 1, block_points=0)
+    assert scheduler.min_latency == 2
+    assert scheduler.max_latency == 2
+    assert scheduler.block_points == 1
+
+
+def test_slow_scan():
+    scheduler = FlushScheduler(0.1, 1, block_points=100, duty=0)
+    scheduler.update(1, 0.01, now=10.)
+    scheduler.update(1, 0.01, now=11.)
+    assert scheduler.interval == pytest.approx(0.1)
+    assert scheduler.delay(11.05) == pytest.approx(0.05)
+    assert not scheduler.due(11.05)
+    assert scheduler.due(11.1)
+
+
+def test_fast_scan_collects_blocks():
+    scheduler = FlushScheduler(0.01, 1, block_points=100, duty=0,
+                               smoothing=1)
+    scheduler.update(50, 0.001, now=10.)
+    scheduler.update(50, 0.001, now=10.1)
+    # 500 points per second
+    assert scheduler.rate == pytest.approx(500)
+    assert scheduler.interval == pytest.approx(0.2)
+
+
+def test_growing_backlog():
+    scheduler = FlushScheduler(0.01, 1, block_points=100, duty=0,
+                               smoothing=1)
+    scheduler.update(50, 0.001, now=10.)
+    scheduler.update(300, 0.001, now=10.1)
+    assert scheduler.interval == pytest.approx(0.01)
+
+
+def test_duty_limit():
+    scheduler = FlushScheduler(0.01, 1, block_points=100, duty=0.2,
+                               smoothing=1)
+    scheduler.update(1, 0.1, now=10.)
+    assert scheduler.interval == pytest.approx(0.5)
+    scheduler.update(1, 1., now=11.)
+    assert scheduler.interval == pytest.approx(1)
+
+
+def test_default_cadence():
+    # one write per second as with the former max_write_interval
+    scheduler = FlushScheduler(1, 1)
+    scheduler.update(5000, 0.01, now=10.)
+    scheduler.update(1, 0.01, now=11.)
+    assert scheduler.interval == pytest.approx(1)
+    assert not scheduler.due(11.5)
+    assert scheduler.due(12.)
@@ -0,0 +1,537 @@
+""" tests of NXSFile helpers """
+
+import gc
+import os
+import pathlib
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pytest
+from blissdata.redis_engine.exceptions import EndOfStream
+from pninexus import h5cpp
+
+import nxsblisswriter.NXSFile as nxsfile
+from nxsblisswriter.NXSFile import (
+    MIN_EXTENT_STEP, NXSFile, WriteTarget, chunk_encoder, chunk_rows,
+    chunk_shape, data_filters, equal_values, soft_links, source_frames)
+
+
+class Streams:
+
+    """ silent log streams """
+
+    def __getattr__(self, name):
+        return lambda msg: None
+
+
+class View:
+
+    """ stream view """
+
+    def __init__(self, data):
+        self.data = data
+
+    def get_data(self):
+        return self.data
+
+
+class Cursor:
+
+    """ stream cursor returning its data blocks """
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+
+    def read(self, block=True, timeout=0):
+        if not self.blocks:
+            raise EndOfStream()
+        return View(self.blocks.pop(0))
+
+
+class Stream:
+
+    """ scan stream with data blocks """
+
+    plugin = None
+
+    def __init__(self, shape, dtype, blocks, name=None):
+        self.shape = shape
+        self.dtype = dtype
+        self.blocks = list(blocks)
+        self.name = name
+        self.length = sum(len(block) for block in self.blocks)
+        self.sealed = True
+
+    def cursor(self):
+        return Cursor(self.blocks)
+
+    def is_sealed(self):
+        return self.sealed
+
+    def __len__(self):
+        return self.length
+
+
+class CursorGroup:
+
+    """ cursor group reading all streams at once """
+
+    def __init__(self, streams):
+        self.cursors = {stream: stream.cursor() for stream in streams}
+        self.position = {stream: 0 for stream in streams}
+
+    def read(self, block=True, timeout=0):
+        assert timeout > 0
+        views = {}
+        for stream, cursor in self.cursors.items():
+            if cursor.blocks:
+                views[stream] = cursor.read()
+                self.position[stream] += len(views[stream].get_data())
+        if not views and all(st.sealed for st in self.cursors):
+            raise EndOfStream()
+        return views
+
+
+class Scan:
+
+    """ scan with streams """
+
+    def __init__(self, streams, snapshot=None):
+        self.streams = streams
+        self.info = {
+            "snapshot": snapshot or {},
+            "datadesc": {key: {"label": key} for key in streams}}
+
+
+def xml_snapshot():
+    """ snapshot with the nexus file structure xml """
+    with open(os.path.join(os.path.dirname(__file__), "xmlc.xml")) as fl:
+        return {"nxsdatawriter_xmlsettings": {"value": fl.read()}}
+
+
+def create_scan_file(tmp_path, streams, snapshot=None, **options):
+    """ create a nexus file of a scan with its streamed fields """
+    nxsfl = NXSFile(
+        Scan(streams, snapshot), pathlib.Path(tmp_path / "scan.nxs"),
+        Streams(), "/scan:NXentry/instrument:NXinstrument/collection",
+        **options)
+    nxsfl.create_file_structure()
+    nxsfl.write_init_snapshot()
+    nxsfl.prepareChannels()
+    return nxsfl
+
+
+def file_root(nxsfl):
+    """ root group of the open nexus file """
+    return nxsfl._NXSFile__mfile.root()
+
+
+def read_field(tmp_path, path):
+    """ read a field of the scan file """
+    fl = h5cpp.file.open(
+        str(tmp_path / "scan.nxs"), h5cpp.file.AccessFlags.READONLY)
+    data = fl.root().get_dataset(path).read()
+    fl.close()
+    return data
+
+
+def create_field(tmp_path, dtype, frame_shape, chunk, compression="",
+                 name="test.h5"):
+    """ create an empty streamed field """
+    fl = h5cpp.file.create(
+        str(tmp_path / name), h5cpp.file.AccessFlags.TRUNCATE)
+    shape = [0] + list(frame_shape)
+    dataspace = h5cpp.dataspace.Simple(
+        tuple(shape), tuple([h5cpp.dataspace.UNLIMITED] * len(shape)))
+    dcpl = h5cpp.property.DatasetCreationList()
+    dcpl.layout = h5cpp.property.DatasetLayout.CHUNKED
+    dcpl.chunk = tuple(chunk)
+    for flt in data_filters(compression):
+        flt(dcpl)
+    field = h5cpp.node.Dataset(
+        fl.root(), h5cpp.Path("data"),
+        h5cpp.datatype.kFactory.create(np.dtype(dtype)),
+        dataspace, dcpl=dcpl)
+    return fl, field
+
+
+def test_default_write_cadence():
+    nxsfl = NXSFile(None, None, Streams())
+    assert nxsfl.write_delay() == 0
+    nxsfl.write_points([], now=time.monotonic())
+    assert 0 < nxsfl.write_delay() <= 1
+
+
+def test_chunk_rows(tmp_path):
+    fl, field = create_field(tmp_path, "float64", [2], [8, 2])
+    assert chunk_rows(field) == 8
+    field = h5cpp.node.Dataset(
+        fl.root(), h5cpp.Path("contiguous"), h5cpp.datatype.kFloat64,
+        h5cpp.dataspace.Simple((3,)))
+    assert chunk_rows(field) == 1
+    fl.close()
+
+
+def test_close_releases_file(tmp_path):
+    nxsfl = create_scan_file(
+        tmp_path, {"ct": Stream((), "float64", [np.arange(3.)])})
+    nxsfl.write_points(nxsfl.read_scan_points())
+    with pytest.raises(EndOfStream) as info:
+        nxsfl.read_scan_points()
+    gc.disable()
+    try:
+        nxsfl.close()
+        # fails while any handle of the file is alive
+        fl = h5cpp.file.create(
+            str(tmp_path / "scan.nxs"), h5cpp.file.AccessFlags.TRUNCATE)
+        fl.close()
+    finally:
+        gc.enable()
+    assert info.value is not None
+
+
+def test_write_target_exact(tmp_path):
+    fl, field = create_field(tmp_path, "float64", [], [4])
+    target = WriteTarget(field)
+    target.append(np.arange(3.), 3)
+    target.append(np.arange(3., 5.), 2)
+    assert (target.length, target.capacity) == (5, 5)
+    assert list(field.dataspace.current_dimensions) == [5]
+    assert field.read().tolist() == [0., 1., 2., 3., 4.]
+    fl.close()
+
+
+def test_write_target_growth_and_trim(tmp_path):
+    fl, field = create_field(tmp_path, "float64", [], [4])
+    target = WriteTarget(field, exact=False)
+    target.append(np.arange(3.), 3)
+    assert (target.length, target.capacity) == (3, MIN_EXTENT_STEP)
+    target.append(np.arange(3., MIN_EXTENT_STEP + 1), MIN_EXTENT_STEP - 2)
+    assert target.capacity == 2 * MIN_EXTENT_STEP
+    assert list(field.dataspace.current_dimensions) == [2 * MIN_EXTENT_STEP]
+    target.trim()
+    assert (target.length, target.capacity) == (
+        MIN_EXTENT_STEP + 1, MIN_EXTENT_STEP + 1)
+    assert list(field.dataspace.current_dimensions) == [MIN_EXTENT_STEP + 1]
+    assert field.read()[-2:].tolist() == [
+        MIN_EXTENT_STEP - 1, MIN_EXTENT_STEP]
+    fl.close()
+
+
+def test_chunk_shape_user():
+    assert chunk_shape([4, 5], "uint16", 1024, chunk=[2, 4, 0]) == [2, 4, 1]
+    assert chunk_shape([4, 5], "uint16", 1024, chunk=3) == [3, 4, 5]
+
+
+def test_chunk_shape_one_frame():
+    assert chunk_shape([4, 0], "uint16", 0) == [1, 4, 1]
+    assert chunk_shape([], "float64", -1) == [1]
+
+
+def test_chunk_shape_scalars():
+    assert chunk_shape([], "float64", 1024, npoints=10) == [10]
+    assert chunk_shape([], "float64", 1024) == [128]
+    assert chunk_shape([], "float64", 1 << 20) == [MIN_EXTENT_STEP]
+    # variable length strings
+    assert chunk_shape([], "str", 160, npoints=100) == [10]
+
+
+def test_chunk_shape_large_frames():
+    assert chunk_shape([1024, 1024], "uint32", 1 << 20) == [1, 512, 512]
+    assert chunk_shape([512, 512], "uint32", 1 << 20) == [1, 512, 512]
+    assert chunk_shape([256, 256], "uint32", 1 << 20) == [4, 256, 256]
+
+
+def test_data_filters():
+    assert data_filters("") == []
+    assert data_filters(None) == []
+    filters = data_filters("shuffle, deflate:6")
+    assert isinstance(filters[0], h5cpp.filter.Shuffle)
+    assert isinstance(filters[1], h5cpp.filter.Deflate)
+    assert filters[1].level == 6
+    assert data_filters("gzip")[0].level == 4
+    with pytest.raises(ValueError):
+        data_filters("32767")
+
+
+@pytest.mark.parametrize("compression", ["", "deflate:2", "shuffle,deflate"])
+def test_chunk_encoder_roundtrip(tmp_path, compression):
+    fl, field = create_field(tmp_path, "int32", [3], [2, 3], compression)
+    encode = chunk_encoder(field)
+    assert encode is not None
+    values = np.arange(15, dtype="int32").reshape(5, 3)
+    target = WriteTarget(field, encode)
+    assert target.chunk_rows == 2
+    target.append(values[:1], 1)
+    target.append(values[1:], 4)
+    assert list(field.dataspace.current_dimensions) == [5, 3]
+    assert np.array_equal(field.read(), values)
+    fl.close()
+
+
+def test_chunk_encoder_field_dtype(tmp_path):
+    # int32 stream data written to a float64 field defined in xml
+    fl, field = create_field(tmp_path, "float64", [3], [2, 3], "deflate")
+    target = WriteTarget(field, chunk_encoder(field))
+    assert target.encode is not None
+    values = np.arange(12, dtype="int32").reshape(4, 3)
+    target.append(values, 4)
+    assert field.read().tolist() == values.astype("float64").tolist()
+    fl.close()
+
+
+def test_chunk_encoder_unsupported(tmp_path):
+    fl = h5cpp.file.create(
+        str(tmp_path / "test.h5"), h5cpp.file.AccessFlags.TRUNCATE)
+    dcpl = h5cpp.property.DatasetCreationList()
+    dcpl.layout = h5cpp.property.DatasetLayout.CHUNKED
+    dcpl.chunk = (2,)
+    field = h5cpp.node.Dataset(
+        fl.root(), h5cpp.Path("text"), h5cpp.datatype.kVariableString,
+        h5cpp.dataspace.Simple((0,), (h5cpp.dataspace.UNLIMITED,)),
+        dcpl=dcpl)
+    assert chunk_encoder(field) is None
+    fl.close()
+    fl, field = create_field(
+        tmp_path, "int32", [3], [2, 3], "deflate,shuffle", "test2.h5")
+    assert chunk_encoder(field) is None
+    fl.close()
+
+
+def test_batched_reads(tmp_path, monkeypatch):
+    monkeypatch.setattr(nxsfile, "CursorGroup", CursorGroup)
+    streams = {
+        "ct": Stream((), "float64", [np.arange(3.), np.arange(3., 5.)], "ct"),
+        "mca": Stream((2,), "int32", [np.ones((5, 2), "int32")], "mca"),
+        "empty": Stream((), "float64", [], "empty")}
+    nxsfl = create_scan_file(tmp_path, streams, batch_read=True)
+    nxsfl.write_points(nxsfl.read_scan_points())
+    nxsfl.write_points(nxsfl.read_scan_points())
+    with pytest.raises(EndOfStream):
+        nxsfl.read_scan_points()
+    nxsfl.close()
+    path = "/scan/instrument/collection/"
+    assert read_field(tmp_path, path + "ct").tolist() == list(range(5))
+    assert read_field(tmp_path, path + "mca").shape == (5, 2)
+    assert read_field(tmp_path, path + "empty").shape == (0,)
+
+
+def test_batched_reads_sealed_streams(tmp_path, monkeypatch):
+    monkeypatch.setattr(nxsfile, "CursorGroup", CursorGroup)
+    streams = {
+        "ct": Stream((), "float64", [np.arange(3.)], "ct"),
+        "empty": Stream((), "float64", [], "empty")}
+    streams["ct"].sealed = False
+    nxsfl = create_scan_file(tmp_path, streams, batch_read=True)
+    nxsfl.write_points(nxsfl.read_scan_points())
+    # the sealed stream read to its end is finished,
+    # the other one still waits for data
+    assert nxsfl.read_scan_points() == []
+    streams["ct"].sealed = True
+    with pytest.raises(EndOfStream):
+        nxsfl.read_scan_points()
+    nxsfl.close()
+
+
+def link_target(root, path, name):
+    """ target of a soft link """
+    grp = h5cpp.node.get_node(root, h5cpp.Path(path))
+    for lk in grp.links:
+        if lk.path.name == name:
+            return str(lk.target().object_path)
+
+
+def test_clone_skeleton(tmp_path, capfd):
+    skeleton_dir = tmp_path / "skeletons"
+    skeleton_dir.mkdir()
+    snapshot = xml_snapshot()
+    for name in ["scan1", "scan2"]:
+        nxsfl = NXSFile(
+            Scan({}, snapshot), pathlib.Path(tmp_path / ("%s.nxs" % name)),
+            Streams(), skeleton_dir=str(skeleton_dir))
+        nxsfl.create_file_structure()
+        nxsfl.close()
+    nxsfl = NXSFile(
+        Scan({}, snapshot), pathlib.Path(tmp_path / "plain.nxs"), Streams())
+    nxsfl.create_file_structure()
+    nxsfl.close()
+    # dangling links of the skeleton do not print hdf5 errors
+    assert "HDF5-DIAG" not in capfd.readouterr().err
+    assert len(os.listdir(skeleton_dir)) == 1
+
+    plain = h5cpp.file.open(
+        str(tmp_path / "plain.nxs"), h5cpp.file.AccessFlags.READONLY)
+    plinks = soft_links(plain.root())
+    for name in ["scan1", "scan2"]:
+        fl = h5cpp.file.open(
+            str(tmp_path / ("%s.nxs" % name)),
+            h5cpp.file.AccessFlags.READONLY)
+        root = fl.root()
+        assert sorted(soft_links(root)) == sorted(plinks)
+        assert link_target(root, "/scan/data", "exp_c01") == \
+            "/scan/instrument/collection/exp_c01"
+        assert root.attributes["file_name"].read() == \
+            str(tmp_path / ("%s.nxs" % name))
+        fl.close()
+    plain.close()
+
+
+def test_group_cache(tmp_path):
+    nxsfl = create_scan_file(tmp_path, {}, xml_snapshot())
+    root = file_root(nxsfl)
+    path = ["", "scan:NXentry", "instrument:NXinstrument", "collection"]
+    grp = nxsfl.get_group(root, path)
+    assert str(grp.link.path) == "/scan/instrument/collection"
+    assert nxsfl.get_group(root, path) is grp
+    new = nxsfl.get_group(root, path + ["extra:NXcollection"])
+    assert str(new.link.path) == "/scan/instrument/collection/extra"
+    assert new.attributes["NX_class"].read() == "NXcollection"
+    assert nxsfl.get_group(root, path + ["extra:NXcollection"]) is new
+    nxsfl.close()
+
+
+def test_attribute_index(tmp_path):
+    nxsfl = create_scan_file(tmp_path, {})
+    grp = nxsfl.get_group(file_root(nxsfl), ["", "entry:NXentry"])
+    am = grp.attributes
+    names = set()
+    nxsfl.write_attr(am, "units", "str", "mm", names=names)
+    nxsfl.write_attr(am, "vector", "float64", [1., 0., 0.], names=names)
+    assert names == {"units", "vector"}
+    # existing attributes are rewritten only with new values
+    nxsfl.write_attr(am, "units", "str", "deg", names=names)
+    nxsfl.write_attr(am, "vector", "float64", [0., 1., 0.], names=names)
+    nxsfl.write_attr(am, "vector", "float64", [0., 1.], names=names)
+    assert am["units"].read() == "deg"
+    assert am["vector"].read().tolist() == [0., 1.]
+    # without the index the attribute names are read from the file
+    nxsfl.write_attr(am, "units", "str", "rad")
+    assert am["units"].read() == "rad"
+    assert sorted(att.name for att in am) == [
+        "NX_class", "units", "vector"]
+    nxsfl.close()
+
+
+def test_equal_values():
+    assert equal_values(1, 1)
+    assert equal_values([1, 2], np.array([1, 2]))
+    assert not equal_values([1, 2], [1, 2, 3])
+    assert not equal_values([[1, 2]], [1, 2])
+    assert equal_values(float("nan"), float("nan"))
+    assert equal_values([1., np.nan], np.array([1., np.nan]))
+    assert not equal_values(1.0, 1.5)
+    assert equal_values("abc", "abc")
+    assert not equal_values("abc", "abd")
+    assert equal_values({"a": 1}, {"a": 1})
+
+
+def test_node_index(tmp_path):
+    streams = {"exp_c02": Stream((), "float64", [np.arange(3.)])}
+    nxsfl = create_scan_file(tmp_path, streams, xml_snapshot())
+    path = "/scan/instrument/collection"
+    assert nxsfl.node_exists(path) is True
+    assert nxsfl.node_exists(path + "/exp_c02") is True
+    assert nxsfl.node_exists(path + "/missing") is False
+    assert nxsfl.node_exists("/other/group") is False
+    # nodes below fields are not indexed
+    assert nxsfl.node_exists(path + "/exp_c02/value") is None
+    # the field defined in the xml is reused for the stream
+    nxsfl.write_points(nxsfl.read_scan_points())
+    nxsfl.close()
+    assert read_field(tmp_path, path + "/exp_c02").tolist() == [0., 1., 2.]
+
+
+class FinalSnapshot(dict):
+
+    """ snapshot which can be only looked up by item names """
+
+    def items(self):
+        raise AssertionError("the snapshot is partitioned again")
+
+    def __iter__(self):
+        raise AssertionError("the snapshot is partitioned again")
+
+
+def test_snapshot_partition(tmp_path):
+    path = "/scan:NXentry/instrument:NXinstrument/collection"
+    snapshot = {
+        "title": {"value": "my scan", "dtype": "str"},
+        "energy": [
+            {"value": 1.5, "dtype": "float64",
+             "nexus_path": path + "/energy_start"},
+            {"value": None, "dtype": "float64", "strategy": "FINAL",
+             "nexus_path": path + "/energy_end"}],
+        "end_time": {"value": None, "dtype": "str", "strategy": "FINAL"},
+        "comment": {"value": None, "dtype": "str", "strategy": "FINAL"},
+        "skipped": {"value": 1, "dtype": "int64", "strategy": "STEP"}}
+    nxsfl = create_scan_file(tmp_path, {}, snapshot)
+    final = FinalSnapshot(snapshot)
+    final["energy"] = [
+        snapshot["energy"][0], dict(snapshot["energy"][1], value=3.5)]
+    final["end_time"] = dict(snapshot["end_time"], value="12:00")
+    nxsfl._NXSFile__scan.info["snapshot"] = final
+    nxsfl.write_final_snapshot()
+    nxsfl.close()
+    fl = h5cpp.file.open(
+        str(tmp_path / "scan.nxs"), h5cpp.file.AccessFlags.READONLY)
+    grp = fl.root().get_group("scan/instrument/collection")
+    assert grp.get_dataset("title").read() == "my scan"
+    assert grp.get_dataset("energy_start").read() == 1.5
+    assert grp.get_dataset("energy_end").read() == 3.5
+    assert grp.get_dataset("end_time").read() == "12:00"
+    assert not grp.has_dataset("comment")
+    assert not grp.has_dataset("skipped")
+    fl.close()
+
+
+SWMR_READER = """
+from pninexus import h5cpp
+fl = h5cpp.file.open(
+    %r, h5cpp.file.AccessFlags.READONLY | h5cpp.file.AccessFlags.SWMRREAD)
+print(fl.root().get_dataset("%s").read().tolist())
+"""
+
+
+def test_swmr_live_reader(tmp_path):
+    path = "/scan/instrument/collection/ct"
+    streams = {"ct": Stream((), "float64", [np.arange(5.), np.arange(5., 9.)])}
+    nxsfl = create_scan_file(tmp_path, streams, swmr=True, swmr_flush_time=0)
+    nxsfl.start_swmr()
+    nxsfl.write_points(nxsfl.read_scan_points())
+    # the file stays open for writing while another process reads it
+    reader = subprocess.run(
+        [sys.executable, "-c",
+         SWMR_READER % (str(tmp_path / "scan.nxs"), path)],
+        capture_output=True, text=True, check=True)
+    assert reader.stdout.strip() == str(list(np.arange(5.)))
+    nxsfl.write_points(nxsfl.read_scan_points())
+    nxsfl.close()
+    assert read_field(tmp_path, path).tolist() == list(range(9))
+
+
+def test_source_frames(tmp_path):
+    fl, field = create_field(tmp_path, "int32", [3], [2, 3])
+    WriteTarget(field).append(np.zeros((5, 3), dtype="int32"), 5)
+    fl.close()
+    fname = str(tmp_path / "test.h5")
+    assert source_frames(str(tmp_path / "missing.h5"), "/data") == 0
+    assert source_frames(fname, "/data") is None
+    assert source_frames(fname, "/data", True) == 5
+    assert source_frames(fname, "/other", True) == 0
+
+
+def test_check_sources(tmp_path):
+    for fid, frames in enumerate([3, 2]):
+        fl, field = create_field(
+            tmp_path, "int32", [3], [2, 3], name="img_%d.h5" % fid)
+        WriteTarget(field).append(
+            np.zeros((frames, 3), dtype="int32"), frames)
+        fl.close()
+    # source files are relative to the scan file
+    nxsfl = NXSFile(None, pathlib.Path(tmp_path / "scan.nxs"), Streams(),
+                    vds_check="open")
+    frames = nxsfl.check_sources(
+        np.array([3, 3, 3, 1]), np.array([0, 1, 2, 0]), "img_%d.h5", "/data")
+    assert frames.tolist() == [3, 2, 0, 1]
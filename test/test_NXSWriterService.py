@@ -0,0 +1,280 @@
+""" tests of the scan writers """
+
+import os
+import threading
+
+import numpy as np
+import pytest
+from blissdata.redis_engine.exceptions import EndOfStream
+from blissdata.redis_engine.scan import ScanState
+
+from nxsblisswriter import NXSWriterService
+from nxsblisswriter.NXSWriterService import (
+    ScanProcess, ScanWriter, WriterProcessPool)
+
+
+class Streams:
+
+    """ silent log streams """
+
+    def __getattr__(self, name):
+        return lambda msg: None
+
+
+class Scan:
+
+    """ scan changing its state after a number of updates """
+
+    number = 1
+
+    def __init__(self, states=None):
+        self.states = list(states or [])
+        self.state = ScanState.CREATED
+        self.updates = []
+
+    def update(self, **kwargs):
+        assert threading.current_thread() is threading.main_thread()
+        self.updates.append(kwargs)
+        if self.states:
+            self.state = self.states.pop(0)
+
+
+class File:
+
+    """ nexus file returning scan points until the end of streams """
+
+    def __init__(self, blocks):
+        self.blocks = list(blocks)
+        self.reads = []
+        self.written = []
+
+    def write_scan_points(self, timeout=None):
+        self.reads.append(timeout)
+        if not self.blocks:
+            raise EndOfStream()
+        self.written.append(self.blocks.pop(0))
+
+    def write_delay(self):
+        return 0
+
+
+def test_write_loop_events():
+    scan = Scan()
+    nxsfl = File([[1], [2]])
+    sw = ScanWriter(scan, Streams(), 0, event_wait_time=0.5)
+    sw.write_loop(nxsfl)
+    # stream reads wait for events instead of polling
+    assert nxsfl.reads == [0.5, 0.5, 0.5]
+    assert nxsfl.written == [[1], [2]]
+    assert scan.updates == [{"block": False}] * 3
+
+
+def test_write_loop_polling():
+    nxsfl = File([[1]])
+    sw = ScanWriter(Scan(), Streams(), 0, point_sleep_time=0.001)
+    sw.write_loop(nxsfl)
+    assert nxsfl.reads == [None, None]
+
+
+def test_wait_for_state_events():
+    scan = Scan([ScanState.PREPARED, ScanState.STARTED])
+    sw = ScanWriter(scan, Streams(), 0, event_wait_time=0.5)
+    sw.wait_for_state(ScanState.STARTED)
+    assert scan.updates == [{"timeout": 0.5}] * 2
+
+
+def test_wait_for_state_stopped_writer():
+    scan = Scan()
+    sw = ScanWriter(scan, Streams(), 0, event_wait_time=0.5)
+    sw.running = False
+    sw.wait_for_state(ScanState.CLOSED)
+    assert scan.updates == []
+
+
+class PipelineFile:
+
+    """ nexus file of the reader-writer pipeline """
+
+    def __init__(self, blocks, error=None, endless=False):
+        self.blocks = list(blocks)
+        self.error = error
+        self.endless = endless
+        self.written = []
+
+    def read_scan_points(self, timeout=None):
+        if self.blocks:
+            return [("ct", self.blocks.pop(0))]
+        if self.endless:
+            return [("ct", np.zeros(1))]
+        raise self.error or EndOfStream()
+
+    def write_points(self, points):
+        self.written.extend(points)
+
+    def write_delay(self):
+        return 0
+
+
+def test_write_pipeline():
+    blocks = [np.arange(2.), np.arange(2., 5.), np.arange(5., 6.)]
+    nxsfl = PipelineFile(blocks)
+    sw = ScanWriter(Scan(), Streams(), 0, point_sleep_time=0.001,
+                    queue_depth=2)
+    sw.write_pipeline(nxsfl)
+    assert {item for item, _ in nxsfl.written} == {"ct"}
+    assert np.concatenate(
+        [values for _, values in nxsfl.written]).tolist() == list(range(6))
+    assert threading.active_count() == 1
+
+
+def test_write_pipeline_error():
+    nxsfl = PipelineFile([np.arange(2.)], ValueError("read error"))
+    sw = ScanWriter(Scan(), Streams(), 0, point_sleep_time=0.001,
+                    queue_depth=1)
+    with pytest.raises(ValueError):
+        sw.write_pipeline(nxsfl)
+    assert threading.active_count() == 1
+
+
+def test_write_pipeline_stop():
+    nxsfl = PipelineFile([], endless=True)
+    scan = Scan()
+    sw = ScanWriter(scan, Streams(), 0, point_sleep_time=0.001,
+                    queue_depth=1)
+
+    def update(**kwargs):
+        # the writer is stopped while the reader still gets data
+        sw.running = len(scan.updates) < 5
+        scan.updates.append(kwargs)
+
+    scan.update = update
+    sw.write_pipeline(nxsfl)
+    assert not sw.running
+    assert threading.active_count() == 1
+
+
+class PrefetchFile:
+
+    """ nexus file recording the scan states of structure prefetches """
+
+    prefetched = []
+
+    def __init__(self, scan, fpath, streams, **options):
+        self.scan = scan
+        self.options = options
+
+    def prefetch_structure(self):
+        self.prefetched.append((self.scan.state, self.options))
+        return True
+
+
+def test_prefetch_structure(monkeypatch):
+    monkeypatch.setattr(NXSWriterService, "NXSFile", PrefetchFile)
+    monkeypatch.setattr(
+        NXSWriterService, "create_nexus_file", lambda *args: None)
+    PrefetchFile.prefetched = []
+    scan = Scan([ScanState.PREPARED])
+    ScanWriter(scan, Streams(), 0, point_sleep_time=0.001,
+               file_options={"skeleton_dir": "/tmp/nxs"}).run()
+    assert PrefetchFile.prefetched == []
+    scan = Scan([ScanState.PREPARED])
+    ScanWriter(scan, Streams(), 0, point_sleep_time=0.001,
+               file_options={"skeleton_dir": "/tmp/nxs"},
+               prefetch=True).run()
+    # the structure is built by the scan writer before PREPARED
+    assert PrefetchFile.prefetched == [
+        (ScanState.CREATED, {"skeleton_dir": "/tmp/nxs"})]
+    assert scan.state == ScanState.PREPARED
+
+
+def crash_scan(redis_url, key, messages, stop, options):
+    """ scan writer process crashing for the 'crash' scan """
+    if key == "crash":
+        os._exit(1)
+    messages.put(("info", "written %s" % key))
+    messages.put(("errors", []))
+
+
+class MessageStreams:
+
+    """ log streams recording messages """
+
+    def __init__(self):
+        self.messages = []
+
+    def __getattr__(self, name):
+        return lambda msg: self.messages.append((name, msg))
+
+
+def test_broken_process_pool(monkeypatch):
+    monkeypatch.setattr(NXSWriterService, "write_scan", crash_scan)
+    pool = WriterProcessPool(1)
+    try:
+        streams = MessageStreams()
+        sw = ScanProcess("", "crash", streams, (), pool)
+        sw.run()
+        assert sw.error
+        assert sw.errors == ["scan writer process crash terminated abruptly"]
+        # the following scans are written by a new pool
+        for key in ["scan1", "scan2"]:
+            streams = MessageStreams()
+            sw = ScanProcess("", key, streams, (), pool)
+            sw.run()
+            assert not sw.error
+            assert streams.messages == [("info", "written %s" % key)]
+    finally:
+        pool.shutdown()
+
+
+class DataStore:
+
+    """ datastore without scans """
+
+    def __init__(self, redis_url):
+        self.redis_url = redis_url
+
+
+class Writer(threading.Thread):
+
+    """ scan writer running until it is finished or stopped """
+
+    def __init__(self, errors=None):
+        threading.Thread.__init__(self)
+        self.running = True
+        self.errors = list(errors or [])
+        self.error = bool(self.errors)
+        self.finish = threading.Event()
+
+    def run(self):
+        while self.running and not self.finish.wait(0.001):
+            pass
+
+    def done(self):
+        self.finish.set()
+        self.join()
+
+
+def test_scan_scheduler(monkeypatch):
+    monkeypatch.setattr(NXSWriterService, "DataStore", DataStore)
+    service = NXSWriterService.NXSWriterService(
+        "redis://", "test", 0, max_writers=2)
+    service._NXSWriterService__running = True
+    pending = service._NXSWriterService__pending
+    running = service._NXSWriterService__sws
+    writers = [Writer(["scan1 failed"]), Writer(), Writer()]
+    pending.extend(("scan%s" % i, sw) for i, sw in enumerate(writers))
+    service.start_scans()
+    assert list(running) == ["scan0", "scan1"]
+    assert [sw for _, sw in pending] == [writers[2]]
+    # running writers stay registered
+    service.join_scans()
+    assert list(running) == ["scan0", "scan1"]
+    writers[0].done()
+    service.join_scans()
+    service.start_scans()
+    assert list(running) == ["scan1", "scan2"]
+    assert not pending
+    assert service.errors() == ["scan1 failed"]
+    service.stop()
+    assert not running
+    assert not any(sw.is_alive() for sw in writers)